@@ -0,0 +1,107 @@
+import sys
+import time
+from pathlib import Path
+from collections.abc import Callable, Iterable
+from typing import TYPE_CHECKING
+
+from localStore import Store
+from runTrace import tracer
+if TYPE_CHECKING:
+    import requests
+
+# id and romaji/english/native titles of one AniList media entry
+Titles = dict[str, int | str | None]
+
+MEDIA_FIELDS = "media(search: $%s, type: ANIME) { id title { romaji english native } }"
+
+
+def normalize(title: str) -> str:
+    return " ".join(title.casefold().split())
+
+
+class AniList:
+    url = "https://graphql.anilist.co"
+
+    def __init__(
+        self,
+        store: Store,
+        *,
+        post: Callable[..., "requests.Response"],
+        ttl: float = 7 * 24 * 60 * 60,
+        timeout: float = 5,
+        per_page: int = 5
+    ) -> None:
+        self.store = store
+        self.ttl = ttl
+        self.timeout = timeout
+        self.per_page = per_page
+        self.post = post
+        self.blocked_until = 0.0
+
+    def lookup(self, title: str, *, stale_ok: bool = False) -> list[Titles] | None:
+        entry = self.store.get_anilist(normalize(title))
+        if entry is None:
+            return None
+        fetched, media = entry
+        if not stale_ok and time.time() - fetched >= self.ttl:
+            return None
+        return media
+
+    def search(self, title: str) -> list[Titles] | None:
+        # None means AniList could not be reached and nothing was cached
+        return self.search_many([title])[title]
+
+    def search_many(self, titles: Iterable[str], *, batch_size: int = 10) -> dict[str, list[Titles] | None]:
+        results = {title: self.lookup(title) for title in titles}
+        missing = list(dict.fromkeys(normalize(t) for t, media in results.items() if media is None))
+
+        for i in range(0, len(missing), batch_size):
+            if time.time() < self.blocked_until:
+                print(f"Anilist: rate limited for {self.blocked_until - time.time():.0f}s, using cached results", flush=True)
+                break
+            try:
+                fetched = self._query(missing[i:i + batch_size])
+            except Exception as e:  # noqa: BLE001
+                print(f"Anilist: {e}", flush=True)
+                break
+            for search, media in fetched.items():
+                self.store.set_anilist(search, time.time(), media)
+
+        return {
+            title: media if media is not None else self.lookup(title, stale_ok=True)
+            for title, media in results.items()
+        }
+
+    def _query(self, searches: list[str]) -> dict[str, list[Titles]]:
+        # one aliased Page per search string so a whole batch costs a single request
+        variables = {f"s{i}": search for i, search in enumerate(searches)}
+        params = ", ".join(f"${name}: String" for name in variables)
+        pages = " ".join(
+            f"{name}: Page(perPage: {self.per_page}) {{ {MEDIA_FIELDS % name} }}" for name in variables
+        )
+        query = f"query ({params}) {{ {pages} }}"
+
+        with tracer.span("anilist", "network", searches=len(searches)):
+            response = self.post(self.url, json={"query": query, "variables": variables}, timeout=self.timeout)
+            self._update_rate_limit(response)
+            response.raise_for_status()
+            data = response.json()["data"]
+        return {search: [{"id": m["id"], **m["title"]} for m in data[name]["media"]] for name, search in variables.items()}
+
+    def _update_rate_limit(self, response: "requests.Response") -> None:
+        headers = response.headers
+        if response.status_code == 429:
+            retry_after = headers.get("Retry-After", "60")
+            self.blocked_until = time.time() + float(retry_after)
+        elif headers.get("X-RateLimit-Remaining") == "0":
+            reset = headers.get("X-RateLimit-Reset")
+            self.blocked_until = float(reset) if reset else time.time() + 60
+
+
+if __name__ == "__main__":
+    # Pre-warm the cache: anilistClient.py [TITLE ...] (titles are read from stdin when omitted)
+    titles = sys.argv[1:] or [line.strip() for line in sys.stdin if line.strip()]
+    from httpSession import create_session
+    anilist = AniList(Store(Path(__file__).parent / "subs.db"), post=create_session().post)
+    for title, media in anilist.search_many(titles).items():
+        print(f"{title} -> {media[0]['romaji'] if media else media}")
@@ -0,0 +1,130 @@
+import hashlib
+import importlib
+import os
+from pathlib import Path, PureWindowsPath
+from types import ModuleType
+
+from localStore import Store
+
+# zip is always available; 7z needs py7zr and rar needs rarfile (plus one of the tools it drives: unrar, unar, 7z or bsdtar)
+SAMPLE_SIZE = 64 * 1024
+
+
+def import_optional(name: str) -> ModuleType | None:
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        return None
+
+
+def archive_format(path: os.PathLike) -> str | None:
+    import zipfile
+    if zipfile.is_zipfile(path):
+        return "zip"
+    py7zr = import_optional("py7zr")
+    if py7zr is not None and py7zr.is_7zfile(path):
+        return "7z"
+    rarfile = import_optional("rarfile")
+    if rarfile is not None and rarfile.is_rarfile(path):
+        return "rar"
+    return None
+
+
+def can_extract(name: str) -> bool:
+    # whether an archive can be opened here, judged by its name before it is downloaded
+    suffix = Path(name).suffix.lower()
+    if suffix == ".zip":
+        return True
+    if suffix == ".7z":
+        return import_optional("py7zr") is not None
+    if suffix == ".rar":
+        rarfile = import_optional("rarfile")
+        if rarfile is None:
+            return False
+        try:
+            rarfile.tool_setup()
+        except rarfile.RarCannotExec:
+            return False
+        return True
+    return False
+
+
+def safe_member(name: str) -> bool:
+    # absolute names, drive letters and ".." parts would be written outside the destination folder
+    # (PureWindowsPath splits on both "/" and "\\")
+    member = PureWindowsPath(name)
+    return bool(member.parts) and not member.anchor and ".." not in member.parts
+
+
+def member_path(destination: os.PathLike, member: str) -> Path:
+    # where member ends up once extracted into destination
+    root = Path(destination).resolve()
+    if not safe_member(member) or not (root / member).resolve().is_relative_to(root):
+        raise ValueError(f"Archive member outside the destination folder: {member}")
+    return Path(destination, member)
+
+
+def list_members(path: os.PathLike, fmt: str) -> list[str]:
+    # only reads the archive's directory, nothing is decompressed; unsafe names are skipped
+    if fmt == "zip":
+        import zipfile
+        with zipfile.ZipFile(path) as zfile:
+            names = [info.filename for info in zfile.infolist() if not info.is_dir()]
+    elif fmt == "7z":
+        import py7zr
+        with py7zr.SevenZipFile(path, "r") as zfile:
+            names = [info.filename for info in zfile.list() if not info.is_directory]
+    else:
+        import rarfile
+        with rarfile.RarFile(path) as rfile:
+            names = [info.filename for info in rfile.infolist() if not info.is_dir()]
+    return [name for name in names if safe_member(name)]
+
+
+def extract_members(path: os.PathLike, fmt: str, members: list[str], destination: os.PathLike) -> list[Path]:
+    # streams out just these members; each one's CRC is checked as it is written
+    paths = [member_path(destination, member) for member in members]
+    if fmt == "zip":
+        import zipfile
+        with zipfile.ZipFile(path) as zfile:
+            for member in members:
+                zfile.extract(member, destination)
+    elif fmt == "7z":
+        import py7zr
+        with py7zr.SevenZipFile(path, "r") as zfile:
+            zfile.extract(path=destination, targets=members)
+    else:
+        import rarfile
+        with rarfile.RarFile(path) as rfile:
+            for member in members:
+                rfile.extract(member, destination)
+    return paths
+
+
+def fingerprint(path: os.PathLike) -> str:
+    # hashing a whole season pack would take longer than reading its directory, so the size and
+    # both ends of the file (a zip's directory is at the end) stand in for the content hash
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        size = f.seek(0, os.SEEK_END)
+        digest.update(str(size).encode())
+        f.seek(0)
+        digest.update(f.read(SAMPLE_SIZE))
+        f.seek(max(size - SAMPLE_SIZE, 0))
+        digest.update(f.read(SAMPLE_SIZE))
+    return digest.hexdigest()
+
+
+class ArchiveIndex:
+    # Member lists of the archives seen before, e.g. a season pack opened again for the next episode
+
+    def __init__(self, store: Store) -> None:
+        self.store = store
+
+    def members(self, path: os.PathLike, fmt: str) -> list[str]:
+        key = fingerprint(path)
+        members = self.store.get_archive_members(key)
+        if members is None:
+            members = list_members(path, fmt)
+            self.store.set_archive_members(key, members)
+        return members
@@ -0,0 +1,93 @@
+import hashlib
+import os
+import shutil
+import sys
+import threading
+import time
+from pathlib import Path
+
+from localStore import Store
+
+FICLONE = 0x40049409  # linux ioctl to share the data blocks of a file (btrfs, xfs)
+
+
+def reflink(source: Path, target: Path) -> None:
+    if not sys.platform.startswith("linux"):
+        raise OSError("reflinks are only supported on linux")
+    import fcntl
+    with open(source, "rb") as src, open(target, "wb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            dst.close()
+            target.unlink()
+            raise
+
+
+def place(source: Path, target: Path) -> None:
+    # hardlink, else reflink, else copy; target is replaced
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(f"{target.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+    try:
+        os.link(source, tmp)
+    except OSError:
+        try:
+            reflink(source, tmp)
+        except OSError:
+            shutil.copyfile(source, tmp)
+    os.replace(tmp, target)
+
+
+def file_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BlobCache:
+    # Every downloaded or extracted file is kept once under its sha256 and found again by its key (the
+    # download url, or archive + member), so it can be linked into any other folder without a download.
+    # The least recently used files are removed once the cache grows over max_bytes.
+
+    def __init__(self, store: Store, directory: os.PathLike, *, max_bytes: int) -> None:
+        self.store = store
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+
+    def blob_path(self, digest: str) -> Path:
+        return self.directory / digest[:2] / digest
+
+    def link(self, key: str, target: os.PathLike) -> bool:
+        # puts the file cached for key at target, False if there is none
+        digest = self.store.get_blob_digest(key)
+        if digest is None:
+            return False
+        blob = self.blob_path(digest)
+        if not blob.is_file():
+            self.store.delete_blob(digest)
+            return False
+        place(blob, Path(target))
+        self.store.touch_blob(digest, time.time())
+        return True
+
+    def add(self, key: str, path: os.PathLike) -> None:
+        if self.max_bytes <= 0:
+            return
+        path = Path(path)
+        try:
+            digest = file_digest(path)
+            blob = self.blob_path(digest)
+            if not blob.is_file():
+                place(path, blob)
+            self.store.set_blob(key, digest, blob.stat().st_size, time.time())
+            self.evict()
+        except OSError as e:
+            # the file itself is where it should be, it just won't be reused
+            print(f"Could not cache {path}: {e}", flush=True)
+
+    def evict(self) -> None:
+        for digest in self.store.blobs_over(self.max_bytes):
+            self.blob_path(digest).unlink(missing_ok=True)
+            self.store.delete_blob(digest)
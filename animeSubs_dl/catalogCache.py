@@ -0,0 +1,149 @@
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import asdict, dataclass
+from urllib.parse import urlparse
+from collections.abc import Callable
+from typing import TYPE_CHECKING
+
+from listParser import ParsedList
+from localStore import Store
+from runTrace import tracer
+if TYPE_CHECKING:
+    import requests
+
+
+@dataclass(slots=True)
+class CatalogEntry:
+    entries: dict[str, str]
+    links: dict[str, str]
+    fetched: float = 0.0
+    etag: str | None = None
+    last_modified: str | None = None
+
+
+class CatalogCache:
+
+    def __init__(
+        self,
+        store: Store,
+        *,
+        get: Callable[..., "requests.Response"],
+        ttl: float = 6 * 60 * 60,
+        timeout: float = 10
+    ) -> None:
+        self.store = store
+        self.ttl = ttl
+        self.timeout = timeout
+        self.get = get
+        self.lock = threading.Lock()
+        self.pending: dict[str, Future] = {}
+        self.refreshing: dict[str, threading.Thread] = {}
+        # entries already decoded in this process; keeps a long-running server from re-reading the store
+        self.memory: dict[str, CatalogEntry] = {}
+
+    def get_entry(self, url: str) -> CatalogEntry | None:
+        entry = self.memory.get(url)
+        if entry is None:
+            stored = self.store.get_catalog(url)
+            if stored is None:
+                return None
+            entry = self.memory[url] = CatalogEntry(**stored)
+        return entry
+
+    def is_fresh(self, entry: CatalogEntry, ttl: float | None = None) -> bool:
+        return time.time() - entry.fetched < (self.ttl if ttl is None else ttl)
+
+    def load(
+        self,
+        url: str,
+        parse: Callable[[bytes], ParsedList],
+        *,
+        stale_ok: bool | Callable[[CatalogEntry], bool] = False,
+        ttl: float | None = None
+    ) -> CatalogEntry:
+        # stale_ok: return an expired entry right away and revalidate it in the background;
+        # a function decides per entry, e.g. only when it already lists the wanted episode
+        entry = self.get_entry(url)
+        if entry is not None and self.is_fresh(entry, ttl):
+            return entry
+        if entry is not None and (stale_ok(entry) if callable(stale_ok) else stale_ok):
+            self.refresh_in_background(url, parse)
+            return entry
+        return self.fetch(url, parse)
+
+    def fetch(self, url: str, parse: Callable[[bytes], ParsedList]) -> CatalogEntry:
+        # concurrent fetches of the same url (e.g. a prefetch still in flight) share one request
+        with self.lock:
+            pending = self.pending.get(url)
+            owner = pending is None
+            if owner:
+                pending = self.pending[url] = Future()
+        if not owner:
+            return pending.result()
+
+        try:
+            entry = self._fetch(url, parse)
+        except BaseException as e:
+            pending.set_exception(e)
+            raise
+        else:
+            pending.set_result(entry)
+            return entry
+        finally:
+            with self.lock:
+                del self.pending[url]
+
+    def _fetch(self, url: str, parse: Callable[[bytes], ParsedList]) -> CatalogEntry:
+        cached = self.get_entry(url)
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+
+        with tracer.span("fetch", "network", host=urlparse(url).netloc):
+            response = self.get(url, headers=headers, timeout=self.timeout)
+        if response.status_code == 304 and cached is not None:
+            entry = CatalogEntry(cached.entries, cached.links, time.time(), cached.etag, cached.last_modified)
+        else:
+            response.raise_for_status()
+            with tracer.span("parse", "cpu", host=urlparse(url).netloc):
+                entries, links = parse(response.content)
+            entry = CatalogEntry(
+                entries,
+                links,
+                time.time(),
+                response.headers.get("ETag"),
+                response.headers.get("Last-Modified")
+            )
+
+        self.memory[url] = entry
+        self.store.set_catalog(url, asdict(entry))
+        return entry
+
+    def refresh_in_background(self, url: str, parse: Callable[[bytes], ParsedList]) -> None:
+        with self.lock:
+            if url in self.refreshing:
+                return
+
+            def refresh() -> None:
+                try:
+                    self.fetch(url, parse)
+                except Exception as e:  # noqa: BLE001
+                    print(f"Background refresh of {url} failed: {e}", flush=True)
+                finally:
+                    with self.lock:
+                        del self.refreshing[url]
+
+            # not a daemon thread so the refresh still lands when the script exits right after
+            thread = threading.Thread(target=refresh, name=f"catalog-refresh {url}")
+            self.refreshing[url] = thread
+            thread.start()
+
+    def wait(self) -> None:
+        with self.lock:
+            threads = list(self.refreshing.values())
+        for thread in threads:
+            thread.join()
@@ -0,0 +1,110 @@
+import re
+import time
+from difflib import SequenceMatcher
+from pathlib import Path
+from collections.abc import Iterable, Sequence
+from typing import Any, NamedTuple
+
+from anilistClient import normalize
+from localStore import Store
+from nameParser import NameParser
+
+ARCHIVES = ("zip", "7z", "rar")
+# how much each part of a file's score counts; every part is between 0 and 1
+FILE_WEIGHTS = {"episode": 0.4, "format": 0.15, "title": 0.15, "group": 0.15, "history": 0.15}
+SHOW_WEIGHTS = {"title": 0.75, "history": 0.25}
+# subtitles that can be loaded right away first, archives still need one of their members picked
+FORMATS = {"ass": 1.0, "ssa": 0.9, "srt": 0.8, "vtt": 0.6, "zip": 0.3, "7z": 0.3, "rar": 0.2}
+
+
+class Ranked(NamedTuple):
+    name: str
+    score: float
+    # the unweighted parts of the score, printed to the console when a file is picked automatically
+    parts: dict[str, float]
+
+
+def release_group(name: str) -> str | None:
+    # fansub style names start with the group, e.g. "[SubsPlease] Show - 05 (1080p).ass"
+    match = re.match(r"\s*\[([^\]]+)\]", Path(name).name)
+    return match[1].casefold() if match else None
+
+
+def name_pattern(name: str) -> str:
+    # the name without its numbers, the same for every episode of one release
+    return re.sub(r"\d+", "#", Path(name).name.casefold())
+
+
+def file_format(name: str) -> str:
+    return Path(name).suffix.strip(". ").lower()
+
+
+def similarity(a: str, b: str) -> float:
+    return SequenceMatcher(None, normalize(a), normalize(b)).ratio()
+
+
+def weighted(parts: dict[str, float], weights: dict[str, float]) -> float:
+    return sum(parts[k] * w for k, w in weights.items())
+
+
+class FileRanker:
+    # Ranks the shows and files offered in the menus by how likely they are the right ones for the
+    # video being played, so auto_select in subs-dl.py can skip a menu when the best entry is clearly
+    # right. The files picked for every show are kept in the store and count for its next episodes.
+
+    def __init__(self, store: Store, name_parser: NameParser, *, threshold: float = 0.75, margin: float = 0.1, history: int = 20) -> None:
+        self.store = store
+        self.name_parser = name_parser
+        # score the best entry needs, and how far ahead of the second one it has to be
+        self.threshold = threshold
+        self.margin = margin
+        # past choices of a show that are taken into account
+        self.history = history
+
+    def rank_files(self, names: Sequence[str], *, episode: Any, titles: Iterable[str], show: str, video: str | None = None) -> list[Ranked]:
+        titles = [t for t in titles if t]
+        past = self.store.get_file_choices(show, self.history)
+        groups = {release_group(n) for n in [*past, video or ""]} - {None}
+        patterns = {name_pattern(n) for n in past}
+        formats = {file_format(n) for n in past}
+
+        ranked = []
+        for name, parsed in zip(names, self.name_parser.parse_many([Path(n).name for n in names])):
+            fmt = file_format(name)
+            if parsed.episode is None:
+                # most likely a season pack, which may well have the episode
+                episode_part = 0.5 if fmt in ARCHIVES else 0.0
+            else:
+                episode_part = float(episode is not None and parsed.episode == episode)
+            parts = {
+                "episode": episode_part,
+                "format": FORMATS.get(fmt, 0.5),
+                "title": max((similarity(parsed.title, t) for t in titles), default=0.5) if parsed.title else 0.5,
+                "group": float(release_group(name) in groups),
+                "history": 1.0 if name_pattern(name) in patterns else 0.5 if fmt in formats else 0.0,
+            }
+            ranked.append(Ranked(name, weighted(parts, FILE_WEIGHTS), parts))
+        return sorted(ranked, key=lambda r: -r.score)
+
+    def rank_shows(self, shows: Sequence[str], *, titles: Iterable[str]) -> list[Ranked]:
+        titles = [t for t in titles if t]
+        chosen = self.store.shows_with_choices(list(shows))
+        ranked = []
+        for show in shows:
+            parts = {
+                "title": max((similarity(show, t) for t in titles), default=0.0),
+                "history": float(show in chosen),
+            }
+            ranked.append(Ranked(show, weighted(parts, SHOW_WEIGHTS), parts))
+        return sorted(ranked, key=lambda r: -r.score)
+
+    def confident(self, ranked: list[Ranked]) -> Ranked | None:
+        # the best entry, if it scores over the threshold and clearly better than the next one
+        if not ranked or ranked[0].score < self.threshold:
+            return None
+        if len(ranked) > 1 and ranked[0].score - ranked[1].score < self.margin:
+            return None
+        return ranked[0]
+
+    def record_choice(self, show: str, name: str) -> None:
+        self.store.add_file_choice(show, name, time.time())
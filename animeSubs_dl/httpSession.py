@@ -0,0 +1,132 @@
+import os
+import threading
+from collections.abc import Callable
+from pathlib import Path
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    import requests
+
+
+def create_session(*, retries: int = 2, backoff: float = 0.5, pool_size: int = 10) -> "requests.Session":
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.exceptions import ConnectTimeoutError, MaxRetryError
+    from urllib3.util.request import ACCEPT_ENCODING
+    from urllib3.util.retry import Retry
+
+    class TimeoutRetry(Retry):
+        # urllib3 counts connect timeouts against connect=, so a host that does not answer
+        # would be waited for once per attempt
+        def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None) -> Retry:
+            if isinstance(error, ConnectTimeoutError):
+                raise MaxRetryError(_pool, url, error) from error
+            return super().increment(method, url, response, error, _pool, _stacktrace)
+
+    # Timeouts (connect and read) are not retried so callers still get
+    # requests.exceptions.Timeout right away (get_list relies on it to switch providers);
+    # refused or reset connections are. 429 is left to the caller too, since honouring a
+    # long Retry-After here would stall playback.
+    retry = TimeoutRetry(
+        total=retries,
+        connect=retries,
+        read=False,
+        status=retries,
+        backoff_factor=backoff,
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=frozenset({"GET", "HEAD", "POST"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    # urllib3 keeps one keep-alive connection pool per host behind each adapter
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=pool_size, pool_maxsize=pool_size)
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    # advertises br/zstd only when the matching decoder is installed
+    session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+    return session
+
+
+class LazySession:
+    # Stands in for the shared session so importing requests waits until the first request.
+
+    def __init__(self, **kwargs) -> None:
+        self.kwargs = kwargs
+        self.lock = threading.Lock()
+        self.session: "requests.Session | None" = None
+
+    def get_session(self) -> "requests.Session":
+        with self.lock:
+            if self.session is None:
+                self.session = create_session(**self.kwargs)
+        return self.session
+
+    def get(self, *args, **kwargs) -> "requests.Response":
+        return self.get_session().get(*args, **kwargs)
+
+    def post(self, *args, **kwargs) -> "requests.Response":
+        return self.get_session().post(*args, **kwargs)
+
+
+def download_file(
+    session: "requests.Session | LazySession",
+    url: str,
+    path: os.PathLike,
+    *,
+    timeout: float = 30,
+    progress: Callable[[int, int | None], None] | None = None,
+    chunk_size: int = 64 * 1024
+) -> None:
+    # Streams into "<path>.part" (resuming it with a Range request if a previous
+    # attempt left one behind) and only renames it to path once complete.
+    # The ETag or Last-Modified of the response that started the file is kept in
+    # "<path>.part.validator" and sent as If-Range, so a file changed since then is
+    # downloaded again (200) instead of appended to the old part.
+    path = Path(path)
+    part_path = path.with_name(f"{path.name}.part")
+    validator_path = path.with_name(f"{path.name}.part.validator")
+    validator = validator_path.read_text(encoding="utf-8") if validator_path.is_file() else ""
+    offset = part_path.stat().st_size if part_path.is_file() and validator else 0
+    # ranges are requested on the unencoded body so they line up with the bytes already on disk
+    headers = {"Range": f"bytes={offset}-", "If-Range": validator, "Accept-Encoding": "identity"} if offset else {}
+
+    with session.get(url, headers=headers, stream=True, timeout=timeout) as response:
+        if response.status_code == 416:
+            # the partial file does not match the remote one anymore
+            part_path.unlink()
+            validator_path.unlink(missing_ok=True)
+            return download_file(session, url, path, timeout=timeout, progress=progress, chunk_size=chunk_size)
+        response.raise_for_status()
+
+        resumed = response.status_code == 206 and response.headers.get("Content-Range", "").startswith(f"bytes {offset}-")
+        if not resumed:
+            offset = 0
+            validator_path.unlink(missing_ok=True)
+            validator = resume_validator(response)
+            if validator:
+                validator_path.write_text(validator, encoding="utf-8")
+        length = response.headers.get("Content-Length")
+        total = offset + int(length) if length and "Content-Encoding" not in response.headers else None
+
+        done = offset
+        with open(part_path, "ab" if resumed else "wb") as f:
+            for chunk in response.iter_content(chunk_size):
+                f.write(chunk)
+                done += len(chunk)
+                if progress is not None:
+                    progress(done, total)
+
+    os.replace(part_path, path)
+    validator_path.unlink(missing_ok=True)
+
+
+def resume_validator(response: "requests.Response") -> str:
+    # what If-Range can check a later resume against; weak ETags can't be used for ranges, and the
+    # part of a compressed response holds decoded bytes that no range of the raw file lines up with
+    if "Content-Encoding" in response.headers:
+        return ""
+    etag = response.headers.get("ETag", "")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return response.headers.get("Last-Modified", "")
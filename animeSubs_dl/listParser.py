@@ -0,0 +1,115 @@
+from dataclasses import dataclass
+from html.parser import HTMLParser
+from io import BytesIO
+from collections.abc import Callable, Iterator
+
+# (entries, links) as built by get_list: lowercase title -> title, title -> href
+ParsedList = tuple[dict[str, str], dict[str, str]]
+
+VOID_ELEMENTS = frozenset({
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"
+})
+
+
+@dataclass(slots=True, frozen=True)
+class AnchorSelector:
+    # css is used by the BeautifulSoup backend, classes/child by the streaming ones
+    css: str
+    classes: frozenset[str] = frozenset()
+    child: str | None = None  # only keep anchors with a direct child of this tag
+
+    def matches_tag(self, class_attr: str | None) -> bool:
+        return self.classes.issubset((class_attr or "").split())
+
+
+class AnchorExtractor(HTMLParser):
+    # Collects (text, href) of matching <a> elements while tokenizing, without building a tree
+
+    def __init__(self, selector: AnchorSelector) -> None:
+        super().__init__()
+        self.selector = selector
+        self.results: list[tuple[str, str]] = []
+        self.href: str | None = None
+        self.text: list[str] = []
+        self.depth = 0
+        self.has_child = False
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        if self.href is not None:
+            if self.depth == 0 and tag == self.selector.child:
+                self.has_child = True
+            if tag not in VOID_ELEMENTS:
+                self.depth += 1
+        elif tag == "a":
+            attributes = dict(attrs)
+            if attributes.get("href") is not None and self.selector.matches_tag(attributes.get("class")):
+                self.href = attributes["href"]
+                self.text = []
+                self.depth = 0
+                self.has_child = self.selector.child is None
+
+    def handle_endtag(self, tag: str) -> None:
+        if self.href is None:
+            return
+        if tag == "a":
+            if self.has_child:
+                self.results.append(("".join(self.text), self.href))
+            self.href = None
+        elif self.depth:
+            self.depth -= 1
+
+    def handle_data(self, data: str) -> None:
+        if self.href is not None:
+            self.text.append(data)
+
+
+def collect(pairs: Iterator[tuple[str, str]]) -> ParsedList:
+    result_list = {}
+    links = {}
+    for text, href in pairs:
+        entry_tmp = text.strip()
+        result_list[entry_tmp.lower()] = entry_tmp
+        links[entry_tmp] = href
+    return result_list, links
+
+
+def parse_soup(content: bytes, selector: AnchorSelector) -> ParsedList:
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(content, "html.parser")
+    return collect((entry.text, entry["href"]) for entry in soup.select(selector.css))
+
+
+def parse_stream(content: bytes, selector: AnchorSelector) -> ParsedList:
+    extractor = AnchorExtractor(selector)
+    extractor.feed(content.decode("utf-8", errors="replace"))
+    extractor.close()
+    return collect(iter(extractor.results))
+
+
+def parse_lxml(content: bytes, selector: AnchorSelector) -> ParsedList:
+    from lxml import etree
+
+    def anchors() -> Iterator[tuple[str, str]]:
+        for _, element in etree.iterparse(BytesIO(content), events=("end",), tag="a", html=True, recover=True):
+            href = element.get("href")
+            if (
+                href is not None
+                and selector.matches_tag(element.get("class"))
+                and (selector.child is None or element.find(selector.child) is not None)
+            ):
+                yield "".join(element.itertext()), href
+            element.clear(keep_tail=True)
+
+    return collect(anchors())
+
+
+def get_parser(backend: str = "auto") -> Callable[[bytes, AnchorSelector], ParsedList]:
+    # "auto" prefers lxml when it is installed and falls back to the pure python streaming parser
+    if backend == "auto":
+        try:
+            import lxml  # noqa: F401
+        except ImportError:
+            backend = "stream"
+        else:
+            backend = "lxml"
+    return {"soup": parse_soup, "stream": parse_stream, "lxml": parse_lxml}[backend]
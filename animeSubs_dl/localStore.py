@@ -0,0 +1,296 @@
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS aliases (
+    title TEXT PRIMARY KEY,
+    alias TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS anilist (
+    search TEXT PRIMARY KEY,
+    fetched REAL NOT NULL,
+    media TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS catalog (
+    url TEXT PRIMARY KEY,
+    fetched REAL NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    entries TEXT NOT NULL,
+    links TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS provider_stats (
+    name TEXT PRIMARY KEY,
+    calls INTEGER NOT NULL,
+    failures INTEGER NOT NULL,
+    latency REAL NOT NULL,
+    failure_rate REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS parsed_names (
+    name TEXT PRIMARY KEY,
+    title TEXT,
+    season TEXT NOT NULL,
+    episode TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS archive_members (
+    fingerprint TEXT PRIMARY KEY,
+    members TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    digest TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS blob_keys (
+    key TEXT PRIMARY KEY,
+    digest TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS prewarmed (
+    title TEXT PRIMARY KEY,
+    provider TEXT NOT NULL,
+    show TEXT NOT NULL,
+    href TEXT NOT NULL,
+    finished REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS file_choices (
+    show TEXT NOT NULL,
+    name TEXT NOT NULL,
+    chosen REAL NOT NULL,
+    PRIMARY KEY (show, name)
+);
+CREATE TABLE IF NOT EXISTS show_profiles (
+    title TEXT PRIMARY KEY,
+    show TEXT NOT NULL,
+    sources TEXT NOT NULL,
+    file_pattern TEXT,
+    file_format TEXT,
+    member_pattern TEXT,
+    updated REAL NOT NULL
+);
+"""
+
+
+class Store:
+    # One SQLite connection per thread; WAL lets several mpv instances read while one writes.
+
+    def __init__(self, path: os.PathLike) -> None:
+        self.path = Path(path)
+        self.local = threading.local()
+        with self.connection() as conn:
+            conn.executescript(SCHEMA)
+
+    def connection(self) -> sqlite3.Connection:
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def _one(self, query: str, *args: Any) -> tuple | None:
+        return self.connection().execute(query, args).fetchone()
+
+    def _write(self, query: str, *args: Any) -> None:
+        with self.connection() as conn:
+            conn.execute(query, args)
+
+    def get_alias(self, title: str) -> str | None:
+        row = self._one("SELECT alias FROM aliases WHERE title = ?", title)
+        return row[0] if row else None
+
+    def set_alias(self, title: str, alias: str) -> None:
+        self._write(
+            "INSERT INTO aliases (title, alias) VALUES (?, ?) "
+            "ON CONFLICT(title) DO UPDATE SET alias = excluded.alias",
+            title, alias
+        )
+
+    def get_anilist(self, search: str) -> tuple[float, list] | None:
+        row = self._one("SELECT fetched, media FROM anilist WHERE search = ?", search)
+        return (row[0], json.loads(row[1])) if row else None
+
+    def set_anilist(self, search: str, fetched: float, media: list) -> None:
+        self._write(
+            "INSERT OR REPLACE INTO anilist (search, fetched, media) VALUES (?, ?, ?)",
+            search, fetched, json.dumps(media, ensure_ascii=False)
+        )
+
+    def get_catalog(self, url: str) -> dict | None:
+        row = self._one("SELECT fetched, etag, last_modified, entries, links FROM catalog WHERE url = ?", url)
+        if row is None:
+            return None
+        fetched, etag, last_modified, entries, links = row
+        return {
+            "entries": json.loads(entries),
+            "links": json.loads(links),
+            "fetched": fetched,
+            "etag": etag,
+            "last_modified": last_modified,
+        }
+
+    def set_catalog(self, url: str, entry: dict) -> None:
+        self._write(
+            "INSERT OR REPLACE INTO catalog (url, fetched, etag, last_modified, entries, links) VALUES (?, ?, ?, ?, ?, ?)",
+            url, entry["fetched"], entry["etag"], entry["last_modified"],
+            json.dumps(entry["entries"], ensure_ascii=False), json.dumps(entry["links"], ensure_ascii=False)
+        )
+
+    def get_provider_stats(self) -> dict[str, dict]:
+        rows = self.connection().execute("SELECT name, calls, failures, latency, failure_rate FROM provider_stats")
+        return {
+            name: {"calls": calls, "failures": failures, "latency": latency, "failure_rate": failure_rate}
+            for name, calls, failures, latency, failure_rate in rows
+        }
+
+    def record_provider_call(self, name: str, latency: float, failed: bool, alpha: float) -> None:
+        # moving averages are updated in a single statement so concurrent calls don't overwrite each other
+        self._write(
+            "INSERT INTO provider_stats (name, calls, failures, latency, failure_rate) VALUES (?1, 1, ?3, ?2, ?3) "
+            "ON CONFLICT(name) DO UPDATE SET calls = calls + 1, failures = failures + excluded.failures, "
+            "latency = latency + ?4 * (excluded.latency - latency), "
+            "failure_rate = failure_rate + ?4 * (excluded.failure_rate - failure_rate)",
+            name, latency, int(failed), alpha
+        )
+
+    def get_parsed_names(self, names: list[str]) -> dict[str, tuple]:
+        # name -> (title, season, episode); queried in chunks to stay under SQLite's variable limit
+        result = {}
+        conn = self.connection()
+        for i in range(0, len(names), 500):
+            chunk = names[i:i + 500]
+            rows = conn.execute(
+                f"SELECT name, title, season, episode FROM parsed_names WHERE name IN ({', '.join('?' * len(chunk))})",
+                chunk
+            )
+            for name, title, season, episode in rows:
+                result[name] = (title, json.loads(season), json.loads(episode))
+        return result
+
+    def set_parsed_names(self, parsed: dict[str, tuple]) -> None:
+        with self.connection() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO parsed_names (name, title, season, episode) VALUES (?, ?, ?, ?)",
+                [(name, title, json.dumps(season), json.dumps(episode)) for name, (title, season, episode) in parsed.items()]
+            )
+
+    def get_archive_members(self, fingerprint: str) -> list[str] | None:
+        row = self._one("SELECT members FROM archive_members WHERE fingerprint = ?", fingerprint)
+        return json.loads(row[0]) if row else None
+
+    def set_archive_members(self, fingerprint: str, members: list[str]) -> None:
+        self._write(
+            "INSERT OR REPLACE INTO archive_members (fingerprint, members) VALUES (?, ?)",
+            fingerprint, json.dumps(members, ensure_ascii=False)
+        )
+
+    def get_blob_digest(self, key: str) -> str | None:
+        row = self._one("SELECT digest FROM blob_keys WHERE key = ?", key)
+        return row[0] if row else None
+
+    def set_blob(self, key: str, digest: str, size: int, last_used: float) -> None:
+        with self.connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO blobs (digest, size, last_used) VALUES (?, ?, ?)",
+                (digest, size, last_used)
+            )
+            conn.execute("INSERT OR REPLACE INTO blob_keys (key, digest) VALUES (?, ?)", (key, digest))
+
+    def touch_blob(self, digest: str, last_used: float) -> None:
+        self._write("UPDATE blobs SET last_used = ? WHERE digest = ?", last_used, digest)
+
+    def delete_blob(self, digest: str) -> None:
+        with self.connection() as conn:
+            conn.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+            conn.execute("DELETE FROM blob_keys WHERE digest = ?", (digest,))
+
+    def blobs_over(self, max_bytes: int) -> list[str]:
+        # least recently used blobs that don't fit in max_bytes after the more recent ones
+        rows = self.connection().execute(
+            "SELECT digest FROM (SELECT digest, SUM(size) OVER (ORDER BY last_used DESC) AS total FROM blobs) WHERE total > ?",
+            (max_bytes,)
+        )
+        return [digest for digest, in rows]
+
+    def set_prewarmed(self, title: str, provider: str, show: str, href: str, finished: float) -> None:
+        self._write(
+            "INSERT OR REPLACE INTO prewarmed (title, provider, show, href, finished) VALUES (?, ?, ?, ?, ?)",
+            title, provider, show, href, finished
+        )
+
+    def prewarmed_since(self, since: float) -> set[str]:
+        rows = self.connection().execute("SELECT title FROM prewarmed WHERE finished >= ?", (since,))
+        return {title for title, in rows}
+
+    def add_file_choice(self, show: str, name: str, chosen: float) -> None:
+        self._write("INSERT OR REPLACE INTO file_choices (show, name, chosen) VALUES (?, ?, ?)", show, name, chosen)
+
+    def get_file_choices(self, show: str, limit: int) -> list[str]:
+        # most recent first
+        rows = self.connection().execute(
+            "SELECT name FROM file_choices WHERE show = ? ORDER BY chosen DESC LIMIT ?", (show, limit)
+        )
+        return [name for name, in rows]
+
+    def shows_with_choices(self, shows: list[str]) -> set[str]:
+        result = set()
+        conn = self.connection()
+        for i in range(0, len(shows), 500):
+            chunk = shows[i:i + 500]
+            rows = conn.execute(f"SELECT DISTINCT show FROM file_choices WHERE show IN ({', '.join('?' * len(chunk))})", chunk)
+            result.update(show for show, in rows)
+        return result
+
+    def get_show_profile(self, title: str) -> dict | None:
+        row = self._one(
+            "SELECT show, sources, file_pattern, file_format, member_pattern FROM show_profiles WHERE title = ?",
+            title
+        )
+        if row is None:
+            return None
+        show, sources, file_pattern, file_format, member_pattern = row
+        return {
+            "show": show,
+            "sources": json.loads(sources),
+            "file_pattern": file_pattern,
+            "file_format": file_format,
+            "member_pattern": member_pattern,
+        }
+
+    def set_show_profile(self, title: str, show: str, sources: dict[str, str], updated: float) -> None:
+        # sources: provider name -> href of the show; the file patterns are kept while the show stays the same
+        self._write(
+            "INSERT INTO show_profiles (title, show, sources, updated) VALUES (?1, ?2, ?3, ?4) "
+            "ON CONFLICT(title) DO UPDATE SET show = ?2, sources = ?3, updated = ?4, "
+            "file_pattern = CASE WHEN show = ?2 THEN file_pattern END, "
+            "file_format = CASE WHEN show = ?2 THEN file_format END, "
+            "member_pattern = CASE WHEN show = ?2 THEN member_pattern END",
+            title, show, json.dumps(sources, ensure_ascii=False), updated
+        )
+
+    def set_profile_file(self, title: str, pattern: str, file_format: str) -> None:
+        self._write("UPDATE show_profiles SET file_pattern = ?, file_format = ? WHERE title = ?", pattern, file_format, title)
+
+    def set_profile_member(self, title: str, pattern: str) -> None:
+        self._write("UPDATE show_profiles SET member_pattern = ? WHERE title = ?", pattern, title)
+
+    def migrate_db_json(self, db_path: os.PathLike) -> None:
+        # one-time import of the old title map; the file is renamed so it is not imported again
+        db_path = Path(db_path)
+        if not db_path.is_file():
+            return
+        try:
+            with open(db_path, encoding="utf-8") as f:
+                db = json.load(f)
+            with self.connection() as conn:
+                conn.executemany("INSERT OR IGNORE INTO aliases (title, alias) VALUES (?, ?)", db.items())
+            db_path.replace(db_path.with_name(f"{db_path.name}.migrated"))
+        except FileNotFoundError:
+            # another instance migrated it first
+            pass
+        except ValueError as e:
+            print(f"Could not migrate {db_path}: {e}", flush=True)
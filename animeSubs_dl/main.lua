@@ -2,8 +2,12 @@ local utils = require('mp.utils')
 local script_path = utils.join_path(mp.get_script_directory(), "subs-dl.py")
 local new_ipc_server = "/tmp/mpvsocket"
 local custom_python_cmd
+-- keep a resident subs-dl server running so later searches skip interpreter startup
+local use_server = false
 local running = false
 local script_run
+-- input-ipc-server before the first of the searches running back to back
+local original_ipc_server
 
 if package.config:sub(1,1) == '/' then
     python_cmd = "python3"
@@ -27,9 +31,31 @@ if package.config:sub(1,1) == '/' then
     python_cmd = custom_python_cmd
   end
 
+local function server_arguments()
+    if bin_path then
+        return {bin_path, "--server"}
+    end
+    return {python_cmd, script_path, "--server"}
+end
+
+if use_server then
+    -- exits on its own if another mpv instance already started one
+    mp.command_native_async({
+        name = "subprocess",
+        playback_only = false,
+        detach = true,
+        capture_stdout = false,
+        args = server_arguments(),
+    }, function() end)
+end
+
 function down_subs()
     if running then
+        -- the new search replaces the one still running (or staging the next episodes) and keeps
+        -- using the IPC server set up for it
         mp.abort_async_command(script_run)
+    else
+        original_ipc_server = mp.get_property_native("input-ipc-server")
     end
     running = true
     mp.msg.warn('Searching...')
@@ -57,19 +83,61 @@ function down_subs()
 
     table.insert(arguments, new_ipc_server)
 
-    script_run = mp.command_native_async({
+    local run
+    run = mp.command_native_async({
         name = "subprocess",
         playback_only = true,
         capture_stdout = false,
         args = arguments,
     },
     function(res, val, err)
-        mp.set_property("input-ipc-server", old_ipc_server)
+        -- an aborted run ends after the search that replaced it started, which still needs the socket
+        if run ~= script_run then
+            return
+        end
+        mp.set_property("input-ipc-server", original_ipc_server)
         running = false
     end
     )
+    script_run = run
 
 end;
 
 mp.add_key_binding("Ctrl+J", "auto_download_subs", down_subs, {repeatable=false})
 
+function batch_subs()
+    local arguments
+
+    if bin_path then
+      arguments = {
+        bin_path,
+      }
+    else
+      arguments = {
+        python_cmd,
+        script_path,
+      }
+    end
+
+    table.insert(arguments, "--batch")
+    local working_directory = mp.get_property("working-directory")
+    for _, entry in ipairs(mp.get_property_native("playlist")) do
+        table.insert(arguments, utils.join_path(working_directory, entry.filename))
+    end
+
+    mp.msg.warn('Downloading subtitles for the playlist...')
+    mp.command('show-text "Downloading subtitles for the playlist..."')
+    mp.command_native_async({
+        name = "subprocess",
+        playback_only = false,
+        capture_stdout = false,
+        args = arguments,
+    },
+    function(res, val, err)
+        mp.command('show-text "Finished downloading subtitles for the playlist"')
+    end
+    )
+end;
+
+mp.add_key_binding(nil, "batch_download_subs", batch_subs)
+
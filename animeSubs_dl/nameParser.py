@@ -0,0 +1,56 @@
+import threading
+from collections import OrderedDict
+from collections.abc import Sequence
+from typing import Any, NamedTuple
+
+from localStore import Store
+
+
+class ParsedName(NamedTuple):
+    title: str | None
+    season: Any
+    # usually an int, but aniparse also gives floats (05.5) and lists (01-02)
+    episode: Any
+
+
+def parse_name(name: str) -> ParsedName:
+    import aniparse
+    result = aniparse.parse(name)
+    return ParsedName(result.get("anime_title"), result.get("anime_season"), result.get("episode_number"))
+
+
+class NameParser:
+    # aniparse is slow (about a millisecond per name), so every name is parsed once: results are kept
+    # in memory for the session and in the store for later runs, e.g. the files of a show page.
+
+    def __init__(self, store: Store, *, maxsize: int = 4096) -> None:
+        self.store = store
+        self.maxsize = maxsize
+        self.lock = threading.Lock()
+        self.memory: OrderedDict[str, ParsedName] = OrderedDict()
+
+    def parse(self, name: str) -> ParsedName:
+        return self.parse_many([name])[0]
+
+    def parse_many(self, names: Sequence[str]) -> list[ParsedName]:
+        found = {}
+        with self.lock:
+            for name in names:
+                parsed = self.memory.get(name)
+                if parsed is not None:
+                    self.memory.move_to_end(name)
+                    found[name] = parsed
+        missing = [name for name in dict.fromkeys(names) if name not in found]
+        if missing:
+            stored = {name: ParsedName(*row) for name, row in self.store.get_parsed_names(missing).items()}
+            parsed = {name: parse_name(name) for name in missing if name not in stored}
+            if parsed:
+                self.store.set_parsed_names(parsed)
+            found.update(stored)
+            found.update(parsed)
+            with self.lock:
+                for name in missing:
+                    self.memory[name] = found[name]
+                while len(self.memory) > self.maxsize:
+                    self.memory.popitem(last=False)
+        return [found[name] for name in names]
@@ -0,0 +1,121 @@
+import threading
+import time
+from concurrent.futures import Executor, Future
+from dataclasses import dataclass, field
+from collections.abc import Callable, Sequence
+from typing import Any, TypeVar
+
+from anilistClient import normalize
+from localStore import Store
+
+T = TypeVar("T")
+
+
+class ProviderStats:
+    # Latency and failures of every call made to a provider, kept in the store so a provider that is
+    # consistently slow or down ends up ranked last in every later session.
+
+    def __init__(self, store: Store, *, alpha: float = 0.3, failure_cost: float = 10) -> None:
+        self.store = store
+        # weight of the newest call in the moving averages
+        self.alpha = alpha
+        # seconds a failed call is considered to cost, usually the request timeout
+        self.failure_cost = failure_cost
+
+    def timed(self, name: str, func: Callable[..., T], *args: Any) -> T:
+        start = time.perf_counter()
+        try:
+            result = func(*args)
+        except Exception:
+            self.store.record_provider_call(name, time.perf_counter() - start, True, self.alpha)
+            raise
+        self.store.record_provider_call(name, time.perf_counter() - start, False, self.alpha)
+        return result
+
+    def score(self, stats: dict | None) -> float:
+        # expected seconds until the provider gives a usable answer; untried providers go first
+        if stats is None:
+            return 0.0
+        return stats["latency"] + stats["failure_rate"] * self.failure_cost
+
+    def ranked(self, names: Sequence[str]) -> list[str]:
+        stats = self.store.get_provider_stats()
+        return sorted(names, key=lambda name: self.score(stats.get(name)))
+
+
+@dataclass(slots=True)
+class Candidate:
+    title: str
+    # provider name -> href on that provider, in the order the providers answered
+    sources: dict[str, str] = field(default_factory=dict)
+
+
+class MergedSearch:
+    # Runs one lookup per provider concurrently and merges the answers as they arrive, so the
+    # first provider to answer can be shown while the others are still running.
+
+    def __init__(
+        self,
+        lookups: dict[str, Callable[[], dict[str, str]]],
+        *,
+        executor: Executor,
+        stats: ProviderStats
+    ) -> None:
+        self.lock = threading.Lock()
+        self.candidates: list[Candidate] = []
+        self.by_key: dict[str, Candidate] = {}
+        self.pending: list[str] = stats.ranked(list(lookups))
+        self.rank = {name: i for i, name in enumerate(self.pending)}
+        self.listeners: list[Callable[[list[Candidate]], None]] = []
+        self.first_result = threading.Event()
+        for name in list(self.pending):
+            future = executor.submit(stats.timed, name, lookups[name])
+            future.add_done_callback(lambda f, name=name: self._arrived(name, f))
+
+    def _arrived(self, name: str, future: Future) -> None:
+        try:
+            results = future.result()
+        except Exception as e:  # noqa: BLE001
+            print(f"Searching {name} failed: {e}", flush=True)
+            results = {}
+
+        with self.lock:
+            new = []
+            for title, href in results.items():
+                key = normalize(title)
+                candidate = self.by_key.get(key)
+                if candidate is None:
+                    candidate = self.by_key[key] = Candidate(title)
+                    self.candidates.append(candidate)
+                    new.append(candidate)
+                elif not self.listeners and self.rank[name] < min(self.rank[n] for n in candidate.sources):
+                    candidate.title = title
+                candidate.sources.setdefault(name, href)
+            self.pending.remove(name)
+            if not self.listeners:
+                # nothing is shown yet, so the better ranked providers can still go first
+                self.candidates.sort(key=lambda c: min(self.rank[n] for n in c.sources))
+            if self.candidates or not self.pending:
+                self.first_result.set()
+            # called under the lock so every listener sees the candidates in the same order
+            for listener in self.listeners:
+                listener(new)
+
+    def wait_first(self) -> list[Candidate]:
+        # blocks until a provider found something or all of them are done
+        self.first_result.wait()
+        with self.lock:
+            return list(self.candidates)
+
+    def subscribe(self, listener: Callable[[list[Candidate]], None]) -> None:
+        # listener gets the candidates found so far right away, then every batch of new ones
+        with self.lock:
+            self.listeners.append(listener)
+            listener(list(self.candidates))
+
+    def unsubscribe(self, listener: Callable[[list[Candidate]], None]) -> None:
+        with self.lock:
+            self.listeners.remove(listener)
+
+    def waiting_for(self) -> list[str]:
+        return list(self.pending)
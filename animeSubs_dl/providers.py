@@ -0,0 +1,114 @@
+import json
+from dataclasses import dataclass
+from urllib.parse import quote, unquote, urlencode
+from collections.abc import Callable
+from typing import TYPE_CHECKING
+
+from catalogCache import CatalogCache, CatalogEntry
+from listParser import AnchorSelector, ParsedList, get_parser
+from localStore import Store
+if TYPE_CHECKING:
+    import requests
+
+
+@dataclass(slots=True, frozen=True)
+class HtmlProvider:
+    # A site whose catalog and show pages are scraped for (title, href) anchors
+    name: str
+    base_url: str
+    list_url: str
+    selector: AnchorSelector
+    # "auto" (lxml if installed, else a streaming html.parser extractor), "stream", "lxml" or "soup"
+    parser_backend: str = "auto"
+
+    def parser(self) -> Callable[[bytes], ParsedList]:
+        parse = get_parser(self.parser_backend)
+        selector = self.selector
+        return lambda content: parse(content, selector)
+
+    def show_url(self, href: str) -> str:
+        return self.base_url + href
+
+    def file_url(self, href: str) -> str:
+        return self.base_url + quote(unquote(href.encode("utf-8")))
+
+
+html_providers = {
+    "jimaku": HtmlProvider(
+        "jimaku",
+        "https://jimaku.cc",
+        "https://jimaku.cc",
+        AnchorSelector(".table-data.file-name", classes=frozenset({"table-data", "file-name"}))
+    ),
+    "kitsunekko": HtmlProvider(
+        "kitsunekko",
+        "https://kitsunekko.net/",
+        "https://kitsunekko.net/dirlist.php?dir=subtitles%2Fjapanese%2F",
+        AnchorSelector("a:has(>strong)", child="strong")
+    ),
+}
+
+
+def parse_entries(content: bytes) -> ParsedList:
+    entries = json.loads(content)
+    return {e["name"].lower(): e["name"] for e in entries}, {e["name"]: str(e["id"]) for e in entries}
+
+
+def parse_files(content: bytes) -> ParsedList:
+    files = json.loads(content)
+    return {f["name"].lower(): f["name"] for f in files}, {f["name"]: f["url"] for f in files}
+
+
+class JimakuApi:
+    # jimaku.cc's JSON API: looks shows up by AniList ID and filters files by episode server side.
+    # Needs an API key from the account page on jimaku.cc.
+    name = "jimaku-api"
+
+    def __init__(
+        self,
+        store: Store,
+        api_key: str,
+        *,
+        get: Callable[..., "requests.Response"],
+        timeout: float = 10,
+        ttl: float = 15 * 60,
+        api_url: str = "https://jimaku.cc/api"
+    ) -> None:
+        self.api_url = api_url.rstrip("/")
+
+        def authorized_get(url: str, *, headers: dict, timeout: float) -> "requests.Response":
+            return get(url, headers={**headers, "Authorization": api_key}, timeout=timeout)
+
+        # responses are cached and revalidated exactly like the scraped pages
+        self.cache = CatalogCache(store, get=authorized_get, timeout=timeout, ttl=ttl)
+
+    def search(
+        self,
+        *,
+        anilist_id: int | None = None,
+        query: str | None = None,
+        stale_ok: bool | Callable[[CatalogEntry], bool] = False
+    ) -> dict[str, str]:
+        # show name -> entry id
+        params = {"anime": "true"}
+        if anilist_id is not None:
+            params["anilist_id"] = str(anilist_id)
+        if query is not None:
+            params["query"] = query
+        entry = self.cache.load(f"{self.api_url}/entries/search?{urlencode(params)}", parse_entries, stale_ok=stale_ok)
+        return entry.links
+
+    def files(
+        self,
+        entry_id: str,
+        episode: str | None = None,
+        *,
+        stale_ok: bool | Callable[[CatalogEntry], bool] = False
+    ) -> dict[str, str]:
+        # file name -> download url
+        params = f"?{urlencode({'episode': episode})}" if episode is not None else ""
+        entry = self.cache.load(f"{self.api_url}/entries/{entry_id}/files{params}", parse_files, stale_ok=stale_ok)
+        return entry.links
+
+    def file_url(self, href: str) -> str:
+        return href
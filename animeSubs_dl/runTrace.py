@@ -0,0 +1,126 @@
+import atexit
+import json
+import math
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from collections.abc import Iterator
+from pathlib import Path
+
+# What a span's time was spent on; "user" is time waiting for the user in a menu. Spans covering a
+# whole run or batch have the kind "total" instead.
+KINDS = ("network", "cpu", "ipc", "user")
+
+
+class Tracer:
+    # Enabled with subs-dl.py --trace (or trace_runs in subs-dl.py): every stage of a run is timed as a
+    # span and the run's spans are appended as JSON lines to the trace file when it ends, e.g.
+    # {"run": "...", "stage": "fetch", "kind": "network", "start": 0.41, "duration": 0.87, "host": "jimaku.cc"}
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.path: Path | None = None
+        self.lock = threading.Lock()
+        self.spans: list[dict] = []
+        self.run_id = ""
+        self.run_start = 0.0
+
+    def start(self, path: os.PathLike) -> None:
+        self.enabled = True
+        self.path = Path(path)
+        self.begin_run()
+        atexit.register(self.end_run)
+
+    def begin_run(self) -> None:
+        with self.lock:
+            self.run_id = uuid.uuid4().hex[:12]
+            self.run_start = time.perf_counter()
+
+    def end_run(self) -> None:
+        # spans still running in background threads (e.g. a catalog refresh) end up in the next run
+        if not self.enabled:
+            return
+        with self.lock:
+            spans, self.spans = self.spans, []
+        if not spans:
+            return
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(span, ensure_ascii=False) + "\n" for span in spans)
+        except OSError as e:
+            print(f"Could not write the trace to {self.path}: {e}", flush=True)
+
+    def record(self, stage: str, kind: str, start: float, duration: float, **attrs) -> None:
+        if not self.enabled:
+            return
+        with self.lock:
+            self.spans.append({
+                "run": self.run_id,
+                "stage": stage,
+                "kind": kind,
+                "start": round(start - self.run_start, 6),
+                "duration": round(duration, 6),
+                "thread": threading.current_thread().name,
+                **attrs,
+            })
+
+    @contextmanager
+    def span(self, stage: str, kind: str, **attrs) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            attrs["error"] = type(e).__name__
+            raise
+        finally:
+            self.record(stage, kind, start, time.perf_counter() - start, **attrs)
+
+
+def percentile(values: list[float], p: float) -> float:
+    # nearest rank, values sorted
+    return values[max(math.ceil(p * len(values)) - 1, 0)]
+
+
+def summarize(path: os.PathLike) -> str:
+    # p50/p95 per stage (and host, for network stages) over every run in the trace file,
+    # plus how the runs' time splits between network, cpu, ipc and user
+    durations: defaultdict[tuple[str, str], list[float]] = defaultdict(list)
+    kinds: defaultdict[str, float] = defaultdict(float)
+    runs = set()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                span = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            runs.add(span["run"])
+            stage = f"{span['stage']} {span['host']}" if span.get("host") else span["stage"]
+            durations[(stage, span["kind"])].append(span["duration"])
+            if span["kind"] in KINDS:
+                kinds[span["kind"]] += span["duration"]
+
+    lines = [f"{len(runs)} runs", f"{'stage':<40}{'kind':<9}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'total s':>10}"]
+    for (stage, kind), values in sorted(durations.items(), key=lambda item: -sum(item[1])):
+        values.sort()
+        lines.append(
+            f"{stage[:39]:<40}{kind:<9}{len(values):>7}{percentile(values, 0.5) * 1000:>10.1f}"
+            f"{percentile(values, 0.95) * 1000:>10.1f}{sum(values):>10.2f}"
+        )
+    # spans of concurrent stages overlap, so this is the time spent on each kind, not a share of the wall time
+    total = sum(kinds.values()) or 1
+    lines.append("Time per kind: " + ", ".join(f"{k} {kinds[k]:.2f} s ({kinds[k] * 100 / total:.0f}%)" for k in KINDS if k in kinds))
+    return "\n".join(lines)
+
+
+tracer = Tracer()
+
+if __name__ == "__main__":
+    # runTrace.py [TRACE_FILE], the file written next to subs-dl.py by default
+    print(summarize(sys.argv[1] if len(sys.argv) > 1 else Path(__file__).parent / "traces.jsonl"))
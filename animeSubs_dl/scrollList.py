@@ -1,7 +1,17 @@
+import queue
+import string
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from math import floor
 from dataclasses import dataclass
 from typing import TYPE_CHECKING, Any
-from collections.abc import Callable, Sequence
+from collections.abc import Callable, Iterator, Sequence
+
+from runTrace import tracer
 if TYPE_CHECKING:
     from python_mpv_jsonipc import MPV
 
@@ -17,6 +27,62 @@ class scrollStyle:
     # only used for multiple selections
     selected_multi: str = "{\\c&00ccff&}"
 
+
+# keys that type into the filter, by mpv key name
+FILTER_KEYS = {c: c for c in string.ascii_letters + string.digits + "-.,!?'&():_+"} | {"SPACE": " "}
+
+
+def search_key(entry: Any) -> str:
+    return unicodedata.normalize("NFKC", str(entry)).casefold()
+
+
+class InteractionLatency:
+    # Seconds spent per kind of menu interaction, e.g. to measure the IPC round trips against a fake mpv:
+    # "open" (key bindings and first overlay), "overlay" (one OSD update), "close" (hide and unbind)
+    # and "selection" (key press handled until get_selection returns); "think" is the time spent waiting
+    # for the user instead
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.samples: defaultdict[str, list[float]] = defaultdict(list)
+
+    def record(self, kind: str, seconds: float) -> None:
+        with self.lock:
+            self.samples[kind].append(seconds)
+        if kind in TRACED:
+            tracer.record(f"menu {kind}", TRACED[kind], time.perf_counter() - seconds, seconds)
+
+    @contextmanager
+    def measure(self, kind: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(kind, time.perf_counter() - start)
+
+    def summary(self) -> dict[str, tuple[int, float, float]]:
+        # kind -> (count, mean, max)
+        with self.lock:
+            return {kind: (len(v), sum(v) / len(v), max(v)) for kind, v in self.samples.items() if v}
+
+    def reset(self) -> None:
+        with self.lock:
+            self.samples.clear()
+
+
+# selection overlaps with close, so only these go into the run's trace
+TRACED = {"open": "ipc", "overlay": "ipc", "close": "ipc", "think": "user"}
+latency = InteractionLatency()
+# commands that don't depend on each other are sent together instead of waiting for each reply in turn
+ipc_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="scroll-ipc")
+
+
+def pipelined(*calls: Callable[[], Any]) -> None:
+    futures = [ipc_pool.submit(call) for call in calls]
+    for future in futures:
+        future.result()
+
+
 class ScrollList:
 
     def __init__(
@@ -37,6 +103,8 @@ class ScrollList:
         self.comment = f"{self.style.comment}{comment}\\N\\N" if comment else ""
         self.list_data = list_data
         self.total_entries = len(list_data)
+        # entries formatted once instead of on every render
+        self.rows: list[str] = [f"{x}\\N" for x in list_data]
         self.callback = callback if callback else lambda x, y: x
         self.repeatable = repeatable
         self.cursor: int = 0
@@ -48,31 +116,62 @@ class ScrollList:
         self.key_bindings: dict[str, Callable] = {
             "UP": self.list_up,
             "DOWN": self.list_down,
+            "PGUP": self.page_up,
+            "PGDWN": self.page_down,
+            "HOME": self.list_home,
+            "END": self.list_end,
             "ENTER": self.select,
-            "ESC": self.closeList,
+            "ESC": self.escape,
+            "/": self.start_filter,
         }
         self.active_key_bindings: list[str] = []
+        # type-to-filter: (query, indices of the matching entries) for every prefix typed so far,
+        # so typing narrows the previous result and backspace is free
+        self.filters: list[tuple[str, list[int]]] = []
+        self.filtering = False
+        self.search_keys: list[str] = []
+        self.filter_key_bindings: list[str] = []
+        # indices of list_data shown, None for all of them; the cursor is a position in it
+        self.view: list[int] | None = None
         self.results: Any = None
-        self.mpv.command("set_property", f"user-data/python-scroll/{self.mpv.client_name}", "")
+        # extend() may be called from other threads while the list is shown
+        self.lock = threading.RLock()
+        self.shown = False
+        # last overlay sent to mpv, so renders that change nothing (e.g. DOWN on the last entry) are skipped
+        self.last_osd: str | None = None
+        # "y", "n" or "confirmed" with the time the key press was handled; the key presses already arrive
+        # over mpv's client-message channel, so nothing needs another round trip to report them
+        self.events: queue.SimpleQueue[tuple[str, float]] = queue.SimpleQueue()
+        self.latency = latency
 
     def render(self) -> None:
-        self.osd_overlay_list = ""
+        with self.lock:
+            self._render()
+
+    def _render(self) -> None:
         distance_from_end = self.total_entries - self.cursor - 1
         if distance_from_end >= self.floor_half_max_shown:
             starting_idx = max(0, self.cursor - self.floor_half_max_shown)
         else:
             starting_idx = max(0, self.total_entries - self.max_shown)
-        for i in range(starting_idx, min(starting_idx + self.max_shown, self.total_entries)):
-            style_selected = self._get_style(i)
-            self.osd_overlay_list += (
-                f"{self.style.list}{style_selected}{self.list_data[i]}\\N"
-            )
-        temp_osd = f"{self.header}\\N\\N{self.comment}{self.osd_overlay_list}{self.style.footnote}\\N\\N"
+        self.osd_overlay_list = "".join(
+            f"{self.style.list}{self._get_style(i)}{self.rows[self.original(i)]}"
+            for i in range(starting_idx, min(starting_idx + self.max_shown, self.total_entries))
+        )
+        filter_line = f"{self.style.comment}Filter: {self.filters[-1][0]}_\\N\\N" if self.filtering else ""
+        temp_osd = f"{self.header}\\N\\N{self.comment}{filter_line}{self.osd_overlay_list}{self.style.footnote}\\N\\N"
         if self.footnote is None and self.total_entries > self.max_shown:
             temp_osd += f"({self.cursor+1}/{self.total_entries})"
         elif self.footnote is not None:
             temp_osd += self.footnote
-        self.mpv.osd_overlay(6, "ass-events", temp_osd)
+        if temp_osd == self.last_osd:
+            return
+        self.last_osd = temp_osd
+        with self.latency.measure("overlay"):
+            self.mpv.osd_overlay(6, "ass-events", temp_osd)
+
+    def original(self, position: int) -> int:
+        return self.view[position] if self.view is not None else position
 
     def _get_style(self, index: int) -> str:
         if index == self.cursor:
@@ -80,21 +179,41 @@ class ScrollList:
         return self.style.not_selected_prefix
 
     def list_down(self) -> None:
-        self.cursor = min(self.cursor + 1, self.total_entries - 1)
+        self.cursor = max(min(self.cursor + 1, self.total_entries - 1), 0)
         self.render()
 
     def list_up(self) -> None:
         self.cursor = max(self.cursor - 1, 0)
         self.render()
 
+    def page_down(self) -> None:
+        self.cursor = max(min(self.cursor + self.max_shown, self.total_entries - 1), 0)
+        self.render()
+
+    def page_up(self) -> None:
+        self.cursor = max(self.cursor - self.max_shown, 0)
+        self.render()
+
+    def list_home(self) -> None:
+        self.cursor = 0
+        self.render()
+
+    def list_end(self) -> None:
+        self.cursor = max(self.total_entries - 1, 0)
+        self.render()
+
     def select(self) -> None:
-        self.mpv.command("set_property", f"user-data/python-scroll/{self.mpv.client_name}", "y")
+        if not self.total_entries:
+            return
+        self.events.put(("y", time.perf_counter()))
 
     def update(self, header: str, list_data: Sequence, callback: Callable[[int, Sequence], Any] | None = None, *, comment: str = "", repeatable: bool | None = None) -> None:
         self.header = f"{self.style.header}{header}"
         self.comment = f"{self.style.comment}{comment}\\N\\N" if comment else ""
+        self.stop_filter()
         self.list_data = list_data
         self.total_entries = len(list_data)
+        self.rows = [f"{x}\\N" for x in list_data]
         if repeatable is not None:
             self.repeatable = repeatable
         if callback is not None:
@@ -103,18 +222,104 @@ class ScrollList:
         self.results = None
         self.render()
 
+    def extend(self, list_data: Sequence, *, footnote: str | None = None) -> None:
+        # appends entries (e.g. results still streaming in) without moving the cursor
+        with self.lock:
+            start = len(self.list_data)
+            self.list_data = [*self.list_data, *list_data]
+            self.rows += [f"{x}\\N" for x in list_data]
+            if self.filtering:
+                self.search_keys += [search_key(x) for x in list_data]
+                for query, view in self.filters:
+                    needle = search_key(query)
+                    view += [i for i in range(start, len(self.list_data)) if needle in self.search_keys[i]]
+            self.total_entries = len(self.view) if self.view is not None else len(self.list_data)
+            self.footnote = footnote
+            if self.shown:
+                self._render()
+
+    def hide(self) -> None:
+        with self.lock:
+            self.shown = False
+            self.last_osd = None
+            self.mpv.osd_overlay(6, "ass-events", "")
+
+    def start_filter(self) -> None:
+        with self.lock:
+            if self.filtering:
+                self.type_filter("/")
+                return
+            self.filtering = True
+            self.search_keys = [search_key(x) for x in self.list_data]
+            self.filters = [("", list(range(len(self.list_data))))]
+            self.cursor = 0
+            self._set_view(self.filters[-1][1])
+        filter_keys: dict[str, Callable] = {key: lambda char=char: self.type_filter(char) for key, char in FILTER_KEYS.items()}
+        filter_keys["BS"] = self.backspace_filter
+        pipelined(*self._bind_calls(filter_keys, self.filter_key_bindings))
+
+    def type_filter(self, char: str) -> None:
+        with self.lock:
+            if self.filtering:
+                self._apply_filter(self.filters[-1][0] + char)
+
+    def backspace_filter(self) -> None:
+        with self.lock:
+            if self.filtering:
+                self._apply_filter(self.filters[-1][0][:-1])
+
+    def _apply_filter(self, query: str) -> None:
+        while len(self.filters) > 1 and not query.startswith(self.filters[-1][0]):
+            self.filters.pop()
+        if query != self.filters[-1][0]:
+            needle = search_key(query)
+            self.filters.append((query, [i for i in self.filters[-1][1] if needle in self.search_keys[i]]))
+        self.cursor = 0
+        self._set_view(self.filters[-1][1])
+
+    def _set_view(self, view: list[int] | None) -> None:
+        self.view = view
+        self.total_entries = len(view) if view is not None else len(self.list_data)
+        if self.shown:
+            self._render()
+
+    def stop_filter(self) -> None:
+        # back to the full list, still on the entry the cursor was on
+        with self.lock:
+            if not self.filtering:
+                return
+            self.cursor = self.original(self.cursor) if self.total_entries else 0
+            self.filtering = False
+            self.filters = []
+            self._set_view(None)
+        pipelined(*self._unbind_calls(self.filter_key_bindings))
+
+    def escape(self) -> None:
+        if self.filtering:
+            self.stop_filter()
+        else:
+            self.closeList()
+
     def closeList(self) -> None:
-        self.mpv.osd_overlay(6, "ass-events", "")
-        self.delete_keybindings()
-        self.mpv.command("set_property", f"user-data/python-scroll/{self.mpv.client_name}", "n")
+        self.events.put(("n", time.perf_counter()))
+
+    def _bind_calls(self, key_bindings: dict[str, Callable], bound: list[Callable]) -> list[Callable[[], None]]:
+        def bind(key: str, func: Callable) -> Callable[[], None]:
+            return lambda: bound.append(self.mpv.bind_key_press(key, func, repeatable=True, forced=True))
+        return [bind(key, func) for key, func in key_bindings.items()]
+
+    def _unbind_calls(self, bound: list[Callable]) -> list[Callable[[], None]]:
+        def remove(func: Callable) -> Callable[[], None]:
+            return lambda: self.mpv.remove_key_binding(func)
+        calls = [remove(func) for func in bound]
+        bound.clear()
+        return calls
 
     def register_keybindings(self) -> None:
-        for key, func in self.key_bindings.items():
-            self.active_key_bindings.append(self.mpv.bind_key_press(key, func, repeatable=True, forced=True))
+        pipelined(*self._bind_calls(self.key_bindings, self.active_key_bindings))
 
     def delete_keybindings(self) -> None:
-        for func in self.active_key_bindings:
-            self.mpv.remove_key_binding(func)
+        pipelined(*self._unbind_calls(self.active_key_bindings), *self._unbind_calls(self.filter_key_bindings))
 
     def _callback(self, cursor: int, list_data: Sequence) -> None:
         if self.repeatable:
@@ -123,30 +328,37 @@ class ScrollList:
             # self.results.append(self.callback(cursor, list_data))
             self.results = self.callback(cursor, list_data)
 
+    def show(self) -> None:
+        with self.lock:
+            self.shown = True
+            self._render()
+
+    def close(self) -> None:
+        with self.latency.measure("close"):
+            pipelined(
+                self.hide, *self._unbind_calls(self.active_key_bindings), *self._unbind_calls(self.filter_key_bindings)
+            )
+
     def get_selection(self) -> Any:
-        self.register_keybindings()
-        self.render()
+        while not self.events.empty():  # presses left over from an earlier get_selection
+            self.events.get()
+        with self.latency.measure("open"):
+            # drawn only once every key works, so a press right after the menu appears is not lost
+            self.register_keybindings()
+            self.show()
 
         while True:
-            self.mpv.wait_for_property(f"user-data/python-scroll/{self.mpv.client_name}")
-            temp_selection = self.mpv.command(
-                "get_property", f"user-data/python-scroll/{self.mpv.client_name}"
-            )
-            self.mpv.command("set_property", f"user-data/python-scroll/{self.mpv.client_name}", "")
+            with self.latency.measure("think"):
+                temp_selection, pressed = self.events.get()
             if temp_selection == "y":
-                self._callback(self.cursor, self.list_data)
-            elif temp_selection == "n":
-                return None
-            else:
-                break
-            if not self.repeatable:
+                self._callback(self.original(self.cursor), self.list_data)
+            if temp_selection != "y" or not self.repeatable:
                 break
             self.render()
 
-        self.mpv.osd_overlay(6, "ass-events", "")
-        self.delete_keybindings()
-
-        return self.results
+        self.close()
+        self.latency.record("selection", time.perf_counter() - pressed)
+        return None if temp_selection == "n" else self.results
 
 
 class MultipleSelection(ScrollList):
@@ -171,17 +383,21 @@ class MultipleSelection(ScrollList):
             max_shown=max_shown
         )
         self.results = []
+        # same entries as results (which keeps the selection order), for the lookups done on every render
+        self.selected: set[int] = set()
         self.key_bindings["TAB"] = self.confirmSelection
         self.active_key_bindings.append(self.mpv.bind_key_press("TAB", self.confirmSelection, forced=True))
 
     def _callback(self, cursor: int, list_data: Sequence) -> None:
-        if cursor not in self.results:
+        if cursor not in self.selected:
+            self.selected.add(cursor)
             self.results.append(cursor)
         else:
+            self.selected.remove(cursor)
             self.results.remove(cursor)
 
     def _get_style(self, index: int) -> str:
-        if index not in self.results:
+        if self.original(index) not in self.selected:
             return super()._get_style(index)
 
         if index == self.cursor:
@@ -193,4 +409,4 @@ class MultipleSelection(ScrollList):
         return tmp_style
 
     def confirmSelection(self) -> None:
-        self.mpv.command("set_property", f"user-data/python-scroll/{self.mpv.client_name}", "confirmed")
+        self.events.put(("confirmed", time.perf_counter()))
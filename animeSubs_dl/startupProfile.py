@@ -0,0 +1,58 @@
+import builtins
+import sys
+import threading
+import time
+
+
+class StartupProfiler:
+    # Enabled with subs-dl.py --profile-startup: times every module import and the
+    # phases marked in main(), then prints a report when the first menu is shown.
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.reported = False
+        self.imports: list[tuple[str, int, float]] = []
+        self.phases: list[tuple[str, float]] = []
+        self.local = threading.local()
+        self.original_import = builtins.__import__
+
+    def start(self) -> None:
+        self.enabled = True
+        self.start_time = self.last_mark = time.perf_counter()
+        builtins.__import__ = self._import
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):  # noqa: A002
+        if level == 0 and name in sys.modules:
+            return self.original_import(name, globals, locals, fromlist, level)
+        depth = getattr(self.local, "depth", 0)
+        self.local.depth = depth + 1
+        start = time.perf_counter()
+        try:
+            return self.original_import(name, globals, locals, fromlist, level)
+        finally:
+            self.local.depth = depth
+            self.imports.append((name, depth, time.perf_counter() - start))
+
+    def mark(self, phase: str) -> None:
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last_mark))
+        self.last_mark = now
+
+    def report(self, phase: str, *, top: int = 15) -> None:
+        if not self.enabled or self.reported:
+            return
+        self.mark(phase)
+        self.reported = True
+        builtins.__import__ = self.original_import
+
+        lines = [f"Startup profile ({(self.last_mark - self.start_time) * 1000:.1f} ms total)", "Phases:"]
+        lines += [f"  {name:<24}{elapsed * 1000:9.1f} ms" for name, elapsed in self.phases]
+        lines.append(f"Slowest top-level imports ({top} of {len(self.imports)}):")
+        top_level = sorted((i for i in self.imports if i[1] == 0), key=lambda i: i[2], reverse=True)
+        lines += [f"  {name:<24}{elapsed * 1000:9.1f} ms" for name, _, elapsed in top_level[:top]]
+        print("\n".join(lines), flush=True)
+
+
+profiler = StartupProfiler()
@@ -1,25 +1,44 @@
 import sys
+from startupProfile import profiler
+from subsServer import hand_off, serve
+
+trace_requested = "--trace" in sys.argv
+if trace_requested:
+    sys.argv.remove("--trace")
+if "--profile-startup" in sys.argv:
+    sys.argv.remove("--profile-startup")
+    profiler.start()
+# Hand the mpv socket to a running server (subs-dl.py --server) before paying for the imports below
+elif __name__ == "__main__" and sys.argv[1] not in ("--server", "--batch", "--prewarm") and hand_off(sys.argv[1]):
+    sys.exit()
+
 import os
+import traceback
 import platform
+import tempfile
+import threading
 from pathlib import Path
-import json
-import difflib
-from urllib.request import urlretrieve
-from urllib.parse import quote, unquote, urlparse
+from urllib.parse import urlparse
+from collections.abc import Callable
+from functools import partial
+from typing import Any
 from subprocess import Popen
-import zipfile
-import aniparse
-import requests
-from bs4 import BeautifulSoup
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from python_mpv_jsonipc import MPV
 from scrollList import ScrollList
-
-try:
-    import py7zr
-except ImportError:
-    seven_zip_support = False
-else:
-    seven_zip_support = True
+from catalogCache import CatalogCache, CatalogEntry
+from titleMatcher import TitleIndex
+from providers import HtmlProvider, JimakuApi, html_providers
+from providerSearch import Candidate, MergedSearch, ProviderStats
+from httpSession import LazySession, download_file
+from anilistClient import AniList
+from localStore import Store
+from nameParser import NameParser
+from archives import ArchiveIndex, archive_format, can_extract, extract_members, fingerprint, member_path
+from blobCache import BlobCache
+from fileRanking import FileRanker, Ranked, file_format, name_pattern
+from runTrace import tracer
 
 if platform.system() == "Darwin":       # macOS
     def open_file(filepath: str) -> None:
@@ -33,7 +52,6 @@ else:                                   # linux variants
 
 # Get directory of current file
 directory = Path(__file__).parent
-SOCKET = sys.argv[1]
 
 download_in_folder = True
 download_dir_default: os.PathLike = Path.home() / "mpv_subs"
@@ -41,48 +59,93 @@ download_dir_custom: os.PathLike | None = None
 download_dir: os.PathLike = download_dir_custom or download_dir_default
 download_dir.mkdir(parents=True, exist_ok=True)
 
-mpv = MPV(start_mpv=False, ipc_socket=SOCKET)
-
-db_path = Path(directory) / "db.json"
-if db_path.is_file():
-    with open(db_path) as f:
-        db = json.load(f)
-else:
-    db = {}
-
-
-provider = "jimaku"
+# seconds to wait for each kind of request
+timeouts = {
+    "list": 10,
+    "anilist": 5,
+    "download": 30,
+}
+jimaku_api_key: str | None = os.environ.get("JIMAKU_API_KEY")
+# search every provider at once and merge the results, instead of only falling back to kitsunekko on a timeout
+search_all_providers = False
+# downloads running at the same time in batch mode (subs-dl.py --batch)
+batch_workers = 4
+# shows resolved at the same time by subs-dl.py --prewarm, and how long a resolved show is skipped by later runs
+prewarm_workers = 4
+prewarm_ttl = 6 * 60 * 60
+video_extensions = (".mkv", ".mp4", ".avi", ".webm", ".m4v", ".mov", ".ts", ".wmv", ".flv")
+# downloaded and extracted files are also kept here, so other folders get them without downloading again
+subtitle_cache_dir: os.PathLike = Path(directory) / "subs_cache"
+subtitle_cache_size = 500 * 1024 * 1024  # bytes, 0 disables the cache
+# show pages get new files as episodes air, so they are revalidated far more often than the catalog
+show_list_ttl = 15 * 60
+# after a subtitle is loaded, the ones of this many following episodes are downloaded (or extracted)
+# into subs_cache in the background, so searching them later needs no download; 0 disables it
+prefetch_episodes = 0
+
+# pick the show and file without menus when the best one is clearly right (see fileRanking.py), the
+# menus are still shown, best entries first, when it is not
+auto_select = False
+auto_select_threshold = 0.75
+
+# time every stage of each run (also enabled with subs-dl.py --trace); summarized by runTrace.py
+trace_runs = False
+trace_file: os.PathLike = Path(directory) / "traces.jsonl"
+if trace_runs or trace_requested:
+    tracer.start(trace_file)
+
+# connected to the requesting player for each session, see run_session()
+mpv: MPV | None = None
+# the menu waiting for a key press, closed by end_session() if mpv quits meanwhile
+open_list: ScrollList | None = None
+
+store = Store(Path(directory) / "subs.db")
+store.migrate_db_json(Path(directory) / "db.json")
+
+# requests, bs4/lxml, aniparse, zipfile, py7zr and rarfile are only imported where they are first needed
+session = LazySession()
+catalog_cache = CatalogCache(store, timeout=timeouts["list"], get=session.get)
+anilist = AniList(store, timeout=timeouts["anilist"], post=session.post)
+name_parser = NameParser(store)
+archive_index = ArchiveIndex(store)
+subtitle_cache = BlobCache(store, subtitle_cache_dir, max_bytes=subtitle_cache_size)
+prefetch_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="prefetch")
+provider_stats = ProviderStats(store, failure_cost=timeouts["list"])
+ranker = FileRanker(store, name_parser, threshold=auto_select_threshold)
+
+default_provider = html_providers["jimaku"]
+provider = default_provider
 linkDictionary = {}
+compressed = ("zip", "7z", "rar")
+# provider name -> (catalog the index was built from, index), reused while the catalog is unchanged
+title_indexes: dict[str, tuple[dict, TitleIndex]] = {}
 
-base_url = {
-    "jimaku": "https://jimaku.cc",
-    "kitsunekko": "https://kitsunekko.net/"
-}
+# jimaku's JSON API is used instead of scraping when an API key is set
+jimaku_api = JimakuApi(store, jimaku_api_key, get=session.get, timeout=timeouts["list"], ttl=show_list_ttl) if jimaku_api_key else None
 
-list_url = {
-    "jimaku": "https://jimaku.cc",
-    "kitsunekko": "https://kitsunekko.net/dirlist.php?dir=subtitles%2Fjapanese%2F"
-}
 
-css_selector = {
-    "jimaku": ".table-data.file-name",
-    "kitsunekko": "a:has(>strong)"
-}
+def fetch_list(url: str, *, stale_ok: bool | Callable[[CatalogEntry], bool] = False, ttl: float | None = None) -> dict:
+    # Raises instead of ending the session, so it is safe to call from prefetch threads
+    global provider
+    import requests
+    try:
+        cached = catalog_cache.load(url, provider.parser(), stale_ok=stale_ok, ttl=ttl)
+    except requests.exceptions.Timeout:
+        fallback = html_providers["kitsunekko"]
+        if provider is fallback or url != provider.list_url:
+            raise
+        provider = fallback
+        mpv.show_text("Connection timed out. Trying different provider")
+        return fetch_list(provider.list_url, stale_ok=stale_ok, ttl=ttl)
 
+    linkDictionary.update(cached.links)
+    return cached.entries
 
-def get_list(url: str) -> dict:
-    global provider
+
+def get_list(url: str, *, stale_ok: bool | Callable[[CatalogEntry], bool] = False, ttl: float | None = None) -> dict:
     try:
         mpv.show_text(f"Fetching data from: {url}")
-        response = requests.get(url, timeout=10)
-    except requests.exceptions.Timeout as e:
-        if provider == "kitsunekko" or (url not in list_url.values()):
-            print(e, flush=True)
-            mpv.terminate()
-            sys.exit()
-        provider = "kitsunekko"
-        mpv.show_text("Connection timed out. Trying different provider")
-        return get_list(list_url[provider])
+        return fetch_list(url, stale_ok=stale_ok, ttl=ttl)
     except Exception as e:  # noqa: BLE001
         print(e, flush=True)
         mpv.show_text("Something went wrong. Check console for details.")
@@ -90,43 +153,49 @@ def get_list(url: str) -> dict:
         sys.exit()
         # raise SystemExit(e)
 
-    soup = BeautifulSoup(response.content, "html.parser")
-    entry_list = soup.select(css_selector[provider])
-    result_list = {}
-    for entry in entry_list:
-        entry_tmp = entry.text.strip()
-        # anime_list.append(anime_tmp)
-        result_list[entry_tmp.lower()] = entry_tmp
-        linkDictionary[entry_tmp] = entry["href"]
-    return result_list
-
 
 def get_episode(filename: str) -> str | None:
-    try:
-        result = aniparse.parse(filename)["episode_number"]
-    except KeyError:
-        result = None
-    return result
+    return name_parser.parse(filename).episode
 
 
 def get_title(filename: str) -> str | None:
-    try:
-        temp_result = aniparse.parse(filename)
-        result = temp_result["anime_title"]
-        try:
-            season = temp_result["anime_season"]
-            if season > 1:
-                result += f" {season}"
-        except KeyError:
-            pass
-    except KeyError:
-        result = None
+    temp_result = name_parser.parse(filename)
+    result = temp_result.title
+    if result is not None and temp_result.season is not None and temp_result.season > 1:
+        result += f" {temp_result.season}"
     return result
 
 
+def lists_episode(episode: Any) -> Callable[[CatalogEntry], bool]:
+    # stale_ok for show pages: one that already has files for episode (fetched by an earlier run or
+    # --prewarm) is used right away, one without it is fetched again before it is shown
+    return lambda entry: any(p.episode == episode for p in name_parser.parse_many(list(entry.links)))
+
+
+def has_results(entry: CatalogEntry) -> bool:
+    return bool(entry.links)
+
+
+def wait_for_selection(menu: ScrollList) -> Any:
+    global open_list
+    open_list = menu
+    try:
+        return menu.get_selection()
+    finally:
+        open_list = None
+
+
+def end_session() -> None:
+    # quit_callback: mpv closed the socket, so nothing will ever press a key in the open menu
+    menu = open_list
+    if menu is not None:
+        menu.closeList()
+
+
 def get_list_selection(header: str, list_data: list, comment: str = "") -> int:
+    profiler.report("until first menu")
     temp_list = ScrollList(mpv, header, list_data, comment=comment)
-    selection = temp_list.get_selection()
+    selection = wait_for_selection(temp_list)
     if selection is None:
         mpv.terminate()
         sys.exit()
@@ -134,8 +203,10 @@ def get_list_selection(header: str, list_data: list, comment: str = "") -> int:
 
 
 def get_mp_input(prompt: str = "Type: ") -> str:
+    profiler.report("until first menu")
     while True:
-        temp_result = mpv.get_input(prompt)
+        with tracer.span("input", "user"):
+            temp_result = mpv.get_input(prompt)
         if temp_result:
             return temp_result
         if temp_result is None:
@@ -152,111 +223,398 @@ def is_valid_url(url: str) -> bool:
 
 
 def anilist_search(title: str) -> list:
-    variables = {"page": 1, "perPage": 5, "search": title}
-
-    url = "https://graphql.anilist.co"
-
-    query = """
-        query ($page: Int, $perPage: Int, $search: String) {
-            Page (page: $page, perPage: $perPage) {
-                pageInfo{
-                    total
-                    currentPage
-                    lastPage
-                    hasNextPage
-                }
-                media(search:$search, type:ANIME){
-                    title{
-                        romaji
-                        english
-                        native
-                    }
-                }
-            }
-        }
-    """
-
     # mpv.show_text(f"Anilist search for {title}", 1000)
-    try:
-        response = requests.post(url, json={"query": query, "variables": variables}, timeout=5)
-    except requests.exceptions.Timeout:
-        msg = "Anilist: request timed out"
+    response_data = anilist.search(title)
+
+    if response_data is None:
+        msg = "Anilist: request failed, using parsed title"
         print(msg, flush=True)
         mpv.show_text(msg, 1000)
-        sys.exit()
-
-    response_json = response.json()
-    response_data = response_json["data"]["Page"]["media"]
+        return []
 
     if not response_data:
         mpv.show_text(f"Anilist: no matches for {title}", 1000)
         return []
 
     # mpv.show_text("", 1000)
-    titles_list = [response_data[i]["title"]["romaji"] for i in range(len(response_data))]
+    titles_list = [media["romaji"] for media in response_data]
 
     if titles_list:
-        db[title] = titles_list[0]
-        with open(Path(directory) / "db.json", "w") as f:
-            json.dump(db, f, indent=2)
+        store.set_alias(title, titles_list[0])
 
     return titles_list
 
 
-def handlezip(zip_path: str, dir_path: str, filename_no_ext: str, *, seven_zip: bool = False) -> None:
-    file_handler = py7zr.SevenZipFile if seven_zip else zipfile.ZipFile
+def known_titles(anime: str, parsed: str | None) -> list[str]:
+    # anime, the title parsed from the file name and the other titles AniList has for anime, from the store only
+    titles = [anime, parsed]
+    for media in anilist.lookup(parsed or anime, stale_ok=True) or []:
+        names = [media.get("romaji"), media.get("english"), media.get("native")]
+        if anime in names:
+            titles += names
+    return [t for t in dict.fromkeys(titles) if t]
+
 
-    with file_handler(zip_path, "r") as zfile:
-        test = zfile.testzip()
-        if test is not None:
-            mpv.show_text("File failed testzip, check console for details")
-            print(f"first failed file: {test}", flush=True)
+def auto_pick(ranked: list[Ranked], what: str) -> str | None:
+    # the best ranked entry if auto_select is on and it is clearly right, None to show the menu instead
+    best = ranker.confident(ranked) if auto_select else None
+    if best is not None:
+        parts = ", ".join(f"{k} {v:.2f}" for k, v in best.parts.items())
+        print(f"Selected {what} '{best.name}' automatically, score {best.score:.2f} ({parts})", flush=True)
+        mpv.show_text(f"Selected {what}: {best.name}", 2000)
+    return best.name if best is not None else None
+
+
+def download_progress(name: str) -> Callable[[int, int | None], None]:
+    last_update = 0.0
+
+    def show_progress(done: int, total: int | None) -> None:
+        nonlocal last_update
+        now = time.monotonic()
+        if now - last_update < 0.25 and done != total:
             return
+        last_update = now
+        if total:
+            mpv.show_text(f"Downloading {name}: {done * 100 // total}% ({done / 1e6:.1f}/{total / 1e6:.1f} MB)", 1000)
+        else:
+            mpv.show_text(f"Downloading {name}: {done / 1e6:.1f} MB", 1000)
+
+    return show_progress
+
+
+def title_index(source: HtmlProvider, anime_list: dict) -> TitleIndex:
+    loaded = title_indexes.get(source.name)
+    if loaded is None or loaded[0] is not anime_list:
+        loaded = title_indexes[source.name] = (anime_list, TitleIndex(anime_list))
+    return loaded[1]
+
+
+def load_catalog() -> tuple[dict, TitleIndex]:
+    anime_list = fetch_list(provider.list_url, stale_ok=True)
+    return anime_list, title_index(provider, anime_list)
+
+
+def anilist_id(title: str) -> int | None:
+    media = anilist.search(title) or []
+    for m in media:
+        if title in (m.get("romaji"), m.get("english"), m.get("native")):
+            return m.get("id")
+    return media[0].get("id") if media else None
+
+
+def api_search(title: str) -> dict[str, str] | None:
+    # show name -> jimaku entry id, or None when the API is not configured or unreachable
+    if jimaku_api is None:
+        return None
+    try:
+        show_id = anilist_id(title)
+        shows = jimaku_api.search(anilist_id=show_id, stale_ok=has_results) if show_id is not None else {}
+        return shows or jimaku_api.search(query=title, stale_ok=has_results)
+    except Exception as e:  # noqa: BLE001
+        print(f"Jimaku API: {e}", flush=True)
+        return None
+
+
+def api_files(entry_id: str, episode: str | None = None) -> list[str]:
+    try:
+        mpv.show_text("Fetching data from: jimaku API")
+        files = jimaku_api.files(entry_id, episode, stale_ok=has_results if episode is not None else False)
+    except Exception as e:  # noqa: BLE001
+        print(e, flush=True)
+        mpv.show_text("Something went wrong. Check console for details.")
+        mpv.terminate()
+        sys.exit()
+    linkDictionary.update(files)
+    return sorted(files)
+
+
+def catalog_matches(catalog: Future, title: str, count: int) -> list[str]:
+    try:
+        anime_list, title_index = catalog.result()
+    except Exception as e:  # noqa: BLE001
+        print(e, flush=True)
+        mpv.show_text("Something went wrong. Check console for details.")
+        mpv.terminate()
+        sys.exit()
+    with tracer.span("match", "cpu"):
+        return [anime_list[r] for r in title_index.get_close_matches(title.lower(), count, 0.3)]
 
-        filelist = zfile.namelist()
-        filelist.append("Extract All")
-        file_id = get_list_selection("Select file from zip file", filelist)
-        selected = filelist[file_id]
-        filelist = filelist[:-1]
 
-        selected = [selected] if selected != "Extract All" else filelist
+def search_sources() -> list[HtmlProvider | JimakuApi]:
+    return [jimaku_api or html_providers["jimaku"], html_providers["kitsunekko"]]
 
-        final_path = dir_path
-        dirs = list({Path(x).parent for x in zfile.namelist()})
-        # print(f"dirs: {dirs}", flush=True)
 
-        if len(selected) > 1 and "" in dirs:
-            final_path = Path(dir_path) / filename_no_ext.replace(os.path.sep, " ")
-            # print(f"final_path: {final_path}", flush=True)
+def provider_shows(source: HtmlProvider | JimakuApi, title: str, count: int) -> dict[str, str]:
+    # show name -> href (entry id for the API) of the best matches on one provider, raises on failure
+    if isinstance(source, JimakuApi):
+        show_id = anilist_id(title)
+        shows = source.search(anilist_id=show_id) if show_id is not None else {}
+        return shows or source.search(query=title)
+    cached = catalog_cache.load(source.list_url, source.parser(), stale_ok=True)
+    with tracer.span("match", "cpu", provider=source.name):
+        matches = title_index(source, cached.entries).get_close_matches(title.lower(), count, 0.3)
+    return {cached.entries[r]: cached.links[cached.entries[r]] for r in matches}
+
+
+def provider_files(source: HtmlProvider | JimakuApi, href: str) -> dict[str, str]:
+    # file name -> href of every file of a show on one provider
+    if isinstance(source, JimakuApi):
+        return source.files(href)
+    return catalog_cache.load(source.show_url(href), source.parser(), ttl=show_list_ttl).links
+
+
+def search_all(title: str, count: int) -> MergedSearch:
+    sources = search_sources()
+    return MergedSearch(
+        {s.name: (lambda s=s: provider_shows(s, title, count)) for s in sources},
+        executor=prefetch_pool,
+        stats=provider_stats
+    )
+
+
+def get_streamed_selection(header: str, search: MergedSearch) -> Candidate:
+    # shows the candidates found so far and appends the ones from slower providers as they arrive
+    profiler.report("until first menu")
+    temp_list = ScrollList(mpv, header, [])
+
+    def add(new: list[Candidate]) -> None:
+        waiting = search.waiting_for()
+        temp_list.extend([c.title for c in new], footnote=f"Still searching: {', '.join(waiting)}" if waiting else None)
+
+    search.subscribe(add)
+    try:
+        selection = wait_for_selection(temp_list)
+    finally:
+        search.unsubscribe(add)
+    if selection is None:
+        mpv.terminate()
+        sys.exit()
+    return search.candidates[selection]
+
+
+def merged_files(show: Candidate) -> dict[str, tuple[HtmlProvider | JimakuApi, str]]:
+    # file name -> (provider, href) for the files of every provider the show was found on;
+    # a file listed by several of them is downloaded from the best ranked one
+    sources = {s.name: s for s in search_sources() if s.name in show.sources}
+    ranked = provider_stats.ranked(list(sources))
+    mpv.show_text(f"Fetching data from: {', '.join(ranked)}")
+    futures = [
+        prefetch_pool.submit(provider_stats.timed, name, provider_files, sources[name], show.sources[name])
+        for name in ranked
+    ]
+    files = {}
+    for name, future in zip(ranked, futures):
+        try:
+            links = future.result()
+        except Exception as e:  # noqa: BLE001
+            print(f"Listing files on {name} failed: {e}", flush=True)
+            continue
+        for file_name, href in links.items():
+            files.setdefault(file_name, (sources[name], href))
+    if all(f.exception() is not None for f in futures):
+        mpv.show_text("Something went wrong. Check console for details.")
+        mpv.terminate()
+        sys.exit()
+    return files
+
+
+def profile_sources(profile: dict | None) -> list[tuple[HtmlProvider | JimakuApi, str]]:
+    # (provider, href) of a show picked before on the providers searched with this configuration, the
+    # first one only unless every provider is searched
+    if profile is None:
+        return []
+    found = [(s, profile["sources"][s.name]) for s in search_sources() if s.name in profile["sources"]]
+    return found if search_all_providers else found[:1]
+
+
+def profile_listing(source: HtmlProvider | JimakuApi, href: str, episode: Any) -> dict[str, str]:
+    if isinstance(source, JimakuApi):
+        # like main(), the API only lists the episode's files unless the files of every provider are merged
+        episode = None if search_all_providers else episode
+        return source.files(href, episode, stale_ok=has_results if episode is not None else False)
+    url = source.show_url(href)
+    return catalog_cache.load(url, source.parser(), ttl=show_list_ttl, stale_ok=lists_episode(episode)).links
+
+
+def profile_files(profile: dict, episode: Any, *, inline: bool = False) -> dict[str, tuple[HtmlProvider | JimakuApi, str]] | None:
+    # file name -> (provider, href) of a show picked before, from a single fetch of its page on each
+    # provider; None when that fails, so the show is searched for instead. inline fetches the pages one
+    # after another on the calling thread, for callers already running on prefetch_pool, which could
+    # otherwise wait on tasks queued behind themselves.
+    sources = profile_sources(profile)
+    futures = [None if inline else prefetch_pool.submit(profile_listing, s, href, episode) for s, href in sources[1:]]
+    files = {}
+    for (source, href), future in zip(sources, [None, *futures]):
+        try:
+            links = future.result() if future is not None else profile_listing(source, href, episode)
+        except Exception as e:  # noqa: BLE001
+            print(f"Fetching '{profile['show']}' from {source.name} failed: {e}", flush=True)
+            continue
+        for name, link in links.items():
+            files.setdefault(name, (source, link))
+    return files or None
+
+
+def profile_order(names: list[str], profile: dict | None, key: str) -> list[str]:
+    # names following the pattern picked before for the show first, then the files in its format
+    if profile is None:
+        return names
+    return sorted(names, key=lambda n: (name_pattern(n) != profile[f"{key}_pattern"], key == "file" and file_format(n) != profile["file_format"]))
+
+
+def prefetch_show(title: str, catalog: Future | None, episode: Any) -> None:
+    # Speculatively warm the caches with the show lookup for title: the page of the show picked for
+    # it before, else the API search when it is configured, otherwise the show page of the best
+    # catalog match. The later real lookup picks the result up (or joins the request if it is still in flight).
+    profile = store.get_show_profile(title)
+    if profile_sources(profile):
+        profile_files(profile, episode, inline=True)
+        return
+    if catalog is None:
+        api_search(title)
+        return
+    anime_list, title_index = catalog.result()
+    matches = title_index.get_close_matches(title.lower(), 1, 0.3)
+    if not matches:
+        return
+    url = provider.show_url(linkDictionary[anime_list[matches[0]]])
+    try:
+        catalog_cache.load(url, provider.parser(), ttl=show_list_ttl, stale_ok=lists_episode(episode))
+    except Exception as e:  # noqa: BLE001
+        print(f"Prefetching {url} failed: {e}", flush=True)
+
+
+def episode_file(names: list[str], episode: int, pattern: str | None) -> str | None:
+    # the subtitle of episode named like pattern, else the first one found
+    parsed = name_parser.parse_many([Path(n).name for n in names])
+    found = [n for n, p in zip(names, parsed) if p.episode == episode and not n.endswith(compressed)]
+    return next((n for n in found if name_pattern(n) == pattern), found[0] if found else None)
+
+
+def stage_next_files(files: dict[str, tuple[HtmlProvider | JimakuApi, str]], chosen: str, episode: int, entry_id: str | None) -> None:
+    # Runs in the background after a subtitle was loaded: downloads the files of the next
+    # prefetch_episodes episodes named like chosen into the subtitle cache. The API only lists the
+    # files of one episode at a time, so with entry_id the listing of each episode is fetched first.
+    with tempfile.TemporaryDirectory() as tmp:
+        for next_ep in range(episode + 1, episode + 1 + prefetch_episodes):
             try:
-                Path.mkdir(final_path)
-            except FileExistsError:
-                print(f"Directory '{final_path}' already exists.")
-            except Exception as e:
-                print(f"An error occurred: {e}")
-                mpv.show_text("An error occurred. Check console for more details")
-                mpv.terminate()
-                sys.exit()
-
-        mpv.show_text("Extracting...", 60000)
-
-        if seven_zip:
-            zfile.reset()
-            zfile.extract(path=final_path, targets=selected)
-        else:
-            zfile.extractall(path=final_path, members=selected)
+                if entry_id is not None:
+                    files = files | {n: (jimaku_api, href) for n, href in jimaku_api.files(entry_id, next_ep).items()}
+                name = episode_file(list(files), next_ep, name_pattern(chosen))
+                if name is None:
+                    continue
+                source, href = files[name]
+                batch_download(source, href, Path(tmp, name))
+                print(f"Episode {next_ep} ready: {name}", flush=True)
+            except Exception as e:  # noqa: BLE001
+                print(f"Prefetching episode {next_ep} failed: {e}", flush=True)
+
+
+def stage_next_members(archive: Path, fmt: str, title: str, episode: int) -> None:
+    # the same for a season pack: the members of the next episodes are extracted into the subtitle cache
+    profile = store.get_show_profile(title)
+    pattern = profile["member_pattern"] if profile is not None else None
+    try:
+        members = archive_index.members(archive, fmt)
+        wanted = [episode_file(members, e, pattern) for e in range(episode + 1, episode + 1 + prefetch_episodes)]
+        wanted = sorted({m for m in wanted if m is not None})
+        with tempfile.TemporaryDirectory() as tmp:
+            extract_cached(archive, fmt, wanted, tmp)
+        print(f"Episodes {episode + 1}-{episode + prefetch_episodes} ready: {len(wanted)} files from {archive.name}", flush=True)
+    except Exception as e:  # noqa: BLE001
+        print(f"Prefetching from {archive.name} failed: {e}", flush=True)
+
+
+def extract_cached(archive: os.PathLike, fmt: str, members: list[str], destination: os.PathLike) -> None:
+    # members extracted from the same archive before are linked from the cache instead
+    archive_key = fingerprint(archive)
+    paths = {m: member_path(destination, m) for m in members}
+    missing = [m for m in members if not subtitle_cache.link(f"{archive_key}/{m}", paths[m])]
+    if missing:
+        for m in missing:
+            # may be a hardlink to a cached file, which must not be written through
+            paths[m].unlink(missing_ok=True)
+        with tracer.span("extract", "cpu", members=len(missing)):
+            extract_members(archive, fmt, missing, destination)
+        for m in missing:
+            subtitle_cache.add(f"{archive_key}/{m}", paths[m])
+
+
+def handlezip(
+    zip_path: str,
+    dir_path: str,
+    filename_no_ext: str,
+    fmt: str,
+    episode: Any = None,
+    *,
+    show: str | None = None,
+    titles: list[str] | None = None,
+    title: str | None = None
+) -> None:
+    # only the archive's directory is read (or taken from archive_index) until members are chosen
+    filelist = archive_index.members(zip_path, fmt)
+    # members named like the one picked before for the show first, within the current episode
+    profile = store.get_show_profile(title) if title is not None else None
+    filelist = profile_order(filelist, profile, "member")
+    if episode is not None:
+        # members of the current episode first
+        parsed = name_parser.parse_many([Path(x).name for x in filelist])
+        current = [x for x, p in zip(filelist, parsed) if p.episode == episode]
+        filelist = current + [x for x in filelist if x not in current]
+    all_files = list(filelist)
+    picked = None
+    if auto_select and show is not None:
+        with tracer.span("rank", "cpu", files=len(all_files)):
+            ranked = ranker.rank_files(all_files, episode=episode, titles=titles or [], show=show)
+        picked = auto_pick(ranked, "file")
+    filelist.append("Extract All")
+    selected = picked or filelist[get_list_selection("Select file from zip file", filelist)]
+    filelist = filelist[:-1]
+    if show is not None and selected != "Extract All":
+        ranker.record_choice(show, selected)
+    if title is not None and selected != "Extract All":
+        store.set_profile_member(title, name_pattern(selected))
+
+    selected = [selected] if selected != "Extract All" else filelist
+
+    final_path = dir_path
+    dirs = list({Path(x).parent for x in all_files})
+    # print(f"dirs: {dirs}", flush=True)
+
+    if len(selected) > 1 and "" in dirs:
+        final_path = Path(dir_path) / filename_no_ext.replace(os.path.sep, " ")
+        # print(f"final_path: {final_path}", flush=True)
+        try:
+            Path.mkdir(final_path)
+        except FileExistsError:
+            print(f"Directory '{final_path}' already exists.")
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            mpv.show_text("An error occurred. Check console for more details")
+            mpv.terminate()
+            sys.exit()
 
-        mpv.show_text("Finished Extracting")
+    mpv.show_text("Extracting...", 60000)
 
-        if len(selected) == 1:
-            mpv.command("sub-add", str(Path(final_path, selected[0])))
-            return
+    try:
+        extract_cached(zip_path, fmt, selected, final_path)
+    except Exception as e:  # noqa: BLE001
+        # includes CRC mismatches of the extracted members
+        mpv.show_text("Extracting failed, check console for details")
+        print(f"Extracting from {zip_path} failed: {e}", flush=True)
+        return
 
-        # filelist = os.listdir(final_path)
-        filelist = [x for x in selected if Path(final_path, x).is_file()]
-        file_id = get_list_selection("Select file to load as sub", filelist)
-        selected = filelist[file_id]
-        mpv.command("sub-add", str(Path(final_path, selected)))
+    mpv.show_text("Finished Extracting")
+
+    if len(selected) == 1:
+        mpv.command("sub-add", str(Path(final_path, selected[0])))
+        return
+
+    # filelist = os.listdir(final_path)
+    filelist = [x for x in selected if Path(final_path, x).is_file()]
+    file_id = get_list_selection("Select file to load as sub", filelist)
+    selected = filelist[file_id]
+    mpv.command("sub-add", str(Path(final_path, selected)))
 
 
 def main() -> None:
@@ -276,8 +634,7 @@ def main() -> None:
         mpv.terminate()
         sys.exit()
 
-    anime_list = get_list(list_url[provider])
-
+    profiler.mark("read mpv properties")
     title_options = set()
     episode_options = set()
 
@@ -300,6 +657,18 @@ def main() -> None:
         episode_options.add(parsedMediaTitleEp)
 
     title_options = list(title_options)
+    anilist_futures = {t: prefetch_pool.submit(anilist_search, t) for t in title_options if store.get_alias(t) is None}
+    # the full catalog is only needed when the API is not configured (or fails), and not for shows
+    # that were picked before: their page is fetched directly
+    catalog_future = None
+    known_show = any(profile_sources(store.get_show_profile(store.get_alias(t) or t)) for t in title_options)
+    if search_all_providers and not known_show:
+        for source in search_sources():
+            if isinstance(source, HtmlProvider):
+                prefetch_pool.submit(catalog_cache.load, source.list_url, source.parser(), stale_ok=True)
+    elif jimaku_api is None and not known_show:
+        catalog_future = prefetch_pool.submit(load_catalog)
+    profiler.mark("parse filename")
     parsedTitle = None
     if title_options:
         parsedTitle = title_options[0]
@@ -326,22 +695,41 @@ def main() -> None:
     old_parsedTitle = parsedTitle
     anilist_results = None
 
-    if parsedTitle in db:
-        parsedTitle = db[parsedTitle]
+    alias = store.get_alias(parsedTitle)
+    if alias is not None:
+        parsedTitle = alias
     else:
-        anilist_results = anilist_search(old_parsedTitle)
+        if old_parsedTitle in anilist_futures:
+            anilist_results = anilist_futures[old_parsedTitle].result()
+        else:
+            anilist_results = anilist_search(old_parsedTitle)
         if anilist_results:
             parsedTitle = anilist_results[0]
+    profiler.mark("resolve title")
 
     mpv.show_text("", 1000)
     anime = parsedTitle
-    while True:
+    speculation = prefetch_pool.submit(prefetch_show, anime, catalog_future, anime_ep)
+    # a title confirmed by AniList (now or in an earlier search) is used as is, unless the show picked
+    # before for it would be used: the confirmation is where another show can be chosen instead
+    confirmed = auto_select and (alias is not None or bool(anilist_results)) and not profile_sources(store.get_show_profile(anime))
+    # set when the show picked before for the title should be searched for again
+    search_again = False
+    while not confirmed:
         confirm_options = ["yes", "Change Title", "Change episode", "Change both"]
-        confirmation_id = get_list_selection("Use parsed/guessed data?", confirm_options, f"Title: {anime}\\NEp: {anime_ep}")
+        comment = f"Title: {anime}\\NEp: {anime_ep}"
+        profile = store.get_show_profile(anime)
+        if profile_sources(profile):
+            confirm_options.append("Choose another show")
+            comment += f"\\NShow: {profile['show']}"
+        confirmation_id = get_list_selection("Use parsed/guessed data?", confirm_options, comment)
         confirmation = confirm_options[confirmation_id]
 
         if confirmation == "yes":
             break
+        if confirmation == "Choose another show":
+            search_again = True
+            break
         if confirmation in {"Change Title", "Change both"}:
             if old_parsedTitle:
                 if not anilist_results:
@@ -354,12 +742,32 @@ def main() -> None:
             else:
                 anime = get_mp_input("Type correct Title: ")
             anilist_results = anilist_search(anime)
+            speculation.cancel()
+            speculation = prefetch_pool.submit(prefetch_show, anime, catalog_future, anime_ep)
         if confirmation in {"Change episode", "Change both"}:
             anime_ep = get_mp_input("Type episode number: ")
 
     # print(f"anime: {anime}")
-
-    matches = [anime_list[r] for r in difflib.get_close_matches(anime.lower(), anime_list, 20, 0.3)]
+    api_shows = None
+    profile = None if search_again else store.get_show_profile(anime)
+    profiled = None
+    if profile_sources(profile):
+        mpv.show_text(f"Fetching data from: {', '.join(s.name for s, _ in profile_sources(profile))}")
+        profiled = profile_files(profile, anime_ep)
+    if profiled:
+        matches = [profile["show"]]
+    elif search_all_providers:
+        search = search_all(anime, 20)
+        # a later provider may still rename a candidate, so it is picked by the title it had here
+        found = {c.title: c for c in search.wait_first()}
+        matches = list(found)
+    else:
+        api_shows = api_search(anime)
+        if api_shows is not None:
+            matches = list(api_shows)
+        else:
+            catalog_future = catalog_future or prefetch_pool.submit(load_catalog)
+            matches = catalog_matches(catalog_future, anime, 20)
 
     # print(matches)
 
@@ -368,7 +776,17 @@ def main() -> None:
         retry = ["yes", "no"][retry_id]
         if retry == "yes":
             anime = get_mp_input("Type the title: ")
-            matches = [anime_list[r] for r in difflib.get_close_matches(anime.lower(), anime_list, 10, 0.3)]
+            if search_all_providers:
+                search = search_all(anime, 10)
+                found = {c.title: c for c in search.wait_first()}
+                matches = list(found)
+            else:
+                api_shows = api_search(anime)
+                if api_shows is not None:
+                    matches = list(api_shows)
+                else:
+                    catalog_future = catalog_future or prefetch_pool.submit(load_catalog)
+                    matches = catalog_matches(catalog_future, anime, 10)
             if matches:
                 break
         elif retry == "no":
@@ -376,25 +794,62 @@ def main() -> None:
             sys.exit()
 
     # if old_parsedTitle and db[old_parsedTitle] != anime:
-    if old_parsedTitle and db.get(old_parsedTitle) != anime:
-        db[old_parsedTitle] = anime
-        with open(Path(directory) / "db.json", "w") as f:
-            json.dump(db, f, indent=2)
-
-    selected = get_list_selection("Select Show", matches)
-    selected_show = matches[selected]
-
-    best_match = linkDictionary[matches[selected]]
-
-    url2 = base_url[provider] + best_match
-    ep_list = list(get_list(url2).values())
-    ep_list.sort()
+    if old_parsedTitle and store.get_alias(old_parsedTitle) != anime:
+        store.set_alias(old_parsedTitle, anime)
+
+    titles = known_titles(anime, old_parsedTitle)
+    # the show is left to the user after "Choose another show", else the ranking would pick the same one again
+    picked_show = auto_pick(ranker.rank_shows(matches, titles=titles), "show") if auto_select and not profiled and not search_again else None
+    # file name -> provider to download it from, when the files of several providers were merged
+    file_sources = {}
+    if profiled:
+        # the show picked for this title before, no search and no menu
+        selected_show = profile["show"]
+        source, href = profile_sources(profile)[0]
+        for name, (file_source, link) in profiled.items():
+            file_sources[name] = file_source
+            linkDictionary[name] = link
+        if isinstance(source, JimakuApi) and not search_all_providers:
+            api_shows = {selected_show: href}
+            entry_id = href
+        ep_list = sorted(profiled)
+    elif search_all_providers:
+        if picked_show is not None:
+            show = found[picked_show]
+        else:
+            show = get_streamed_selection("Select Show", search)
+        selected_show = show.title
+        source = None
+        files = merged_files(show)
+        for name, (file_source, href) in files.items():
+            file_sources[name] = file_source
+            linkDictionary[name] = href
+        ep_list = sorted(files)
+        store.set_show_profile(anime, selected_show, show.sources, time.time())
+    elif api_shows is not None:
+        selected_show = picked_show or matches[get_list_selection("Select Show", matches)]
+        source = jimaku_api
+        entry_id = api_shows[selected_show]
+        store.set_show_profile(anime, selected_show, {source.name: entry_id}, time.time())
+        # already filtered to the episode by the API
+        ep_list = api_files(entry_id, anime_ep)
+    else:
+        selected_show = picked_show or matches[get_list_selection("Select Show", matches)]
+        source = provider
+        best_match = linkDictionary[selected_show]
 
-    compressed = ("zip", "7z", "rar")
+        url2 = provider.show_url(best_match)
+        ep_list = list(get_list(url2, ttl=show_list_ttl, stale_ok=lists_episode(anime_ep)).values())
+        ep_list.sort()
+        store.set_show_profile(anime, selected_show, {source.name: best_match}, time.time())
 
 
     if anime_ep is not None:
-        files = [(s) for s in ep_list if anime_ep == get_episode(s)]
+        if api_shows is None:
+            # one store lookup (and aniparse call per new name) for the whole listing instead of one per file
+            with tracer.span("parse names", "cpu", files=len(ep_list)):
+                name_parser.parse_many(ep_list)
+        files = [(s) for s in ep_list if api_shows is not None or anime_ep == get_episode(s)]
         compressedFiles = [(s) for s in ep_list if s.endswith(compressed)]
         finalList = files + compressedFiles
     else:
@@ -403,6 +858,7 @@ def main() -> None:
         files = [(s) for s in ep_list if s not in compressedFiles]
         finalList = compressedFiles + files
 
+    picked = None
     if not finalList:
         confirmation_id = get_list_selection(
             "No matching sub found. Show all files for this show?",
@@ -410,6 +866,8 @@ def main() -> None:
         )
         confirmation = ["yes", "no"][confirmation_id]
         if confirmation == "yes":
+            if api_shows is not None:
+                ep_list = api_files(entry_id)
             # files = [(s) for s in ep_list if not s.endswith(compressed)]
             compressedFiles = [(s) for s in ep_list if s.endswith(compressed)]
             files = [(s) for s in ep_list if s not in compressedFiles]
@@ -418,19 +876,28 @@ def main() -> None:
             mpv.terminate()
             sys.exit()
     else:
+        if auto_select:
+            with tracer.span("rank", "cpu", files=len(finalList)):
+                ranked = ranker.rank_files(finalList, episode=anime_ep, titles=titles, show=selected_show, video=filename)
+            picked = auto_pick(ranked, "file")
+            finalList = [r.name for r in ranked]
+        else:
+            finalList = profile_order(finalList, profile, "file")
         finalList.append("Show all files")
 
-
-    selected = get_list_selection("Select file", finalList)
+    selected = finalList.index(picked) if picked is not None else get_list_selection("Select file", finalList)
 
     if finalList[selected] == "Show all files":
+        if api_shows is not None:
+            ep_list = api_files(entry_id)
         files = [(s) for s in ep_list if not s.endswith(compressed)]
         compressedFiles = [(s) for s in ep_list if s.endswith(compressed)]
         finalList = compressedFiles + files
         selected = get_list_selection("Select file", finalList)
 
 
-    best_file = quote(unquote(linkDictionary[finalList[selected]].encode("utf-8")))
+    ranker.record_choice(selected_show, finalList[selected])
+    store.set_profile_file(anime, name_pattern(finalList[selected]), file_format(finalList[selected]))
     full_filename = Path(finalList[selected])
     base_filename, ext = full_filename.stem, full_filename.suffix.strip(". ")
     print(f"base: {base_filename}, ext: {ext}")
@@ -444,12 +911,17 @@ def main() -> None:
     mpv.show_text(f"Downloading file: {full_path}", 1000)
 
 
-    url3 = base_url[provider] + best_file
+    url3 = file_sources.get(finalList[selected], source).file_url(linkDictionary[finalList[selected]])
     # print(url3)
     download = True
-    if Path(full_path).is_file():
+    if Path(full_path).is_file() and picked is not None:
+        download = False
+    elif Path(full_path).is_file():
         download_options = ["Use existing file", "Download and overwrite file"]
         download = bool(get_list_selection("This file already exists", download_options))
+    elif subtitle_cache.link(url3, full_path):
+        # downloaded before for another folder
+        download = False
 
     if download:
 
@@ -457,9 +929,9 @@ def main() -> None:
             if not url3.startswith(("http:", "https:")):
                 raise ValueError("URL must start with 'http:' or 'https:'")
 
-            file_response = requests.get(url3, timeout=30)
-            with open(full_path, mode="wb") as f:
-                f.write(file_response.content)
+            with tracer.span("download", "network", host=urlparse(url3).netloc):
+                download_file(session, url3, full_path, timeout=timeouts["download"], progress=download_progress(full_path.name))
+            subtitle_cache.add(url3, full_path)
         except Exception as e:
             print(e, flush=True)
             mpv.show_text("Something went wrong. Check console for details.")
@@ -467,13 +939,15 @@ def main() -> None:
             sys.exit()
             # raise SystemExit(e)
 
+    # stages the next episodes once the subtitle is loaded, see prefetch_episodes
+    stage = None
     if full_path.suffix.strip(". ") in compressed:
         mpv.show_text("Downloaded file is a compressed file", 1000)
 
-        if zipfile.is_zipfile(full_path):
-            handlezip(full_path, videoFilePath, base_filename)
-        elif seven_zip_support and py7zr.is_7zfile(full_path):
-            handlezip(full_path, videoFilePath, base_filename, seven_zip=True)
+        fmt = archive_format(full_path)
+        if fmt is not None:
+            handlezip(full_path, videoFilePath, base_filename, fmt, anime_ep, show=selected_show, titles=titles, title=anime)
+            stage = partial(stage_next_members, full_path, fmt, anime, anime_ep)
         else:
             try:
                 open_file(str(full_path))
@@ -481,11 +955,250 @@ def main() -> None:
                 mpv.show_text(f"Failed to open downloaded file: {full_path}", 1000)
     else:
         mpv.command("sub-add", str(full_path))
+        listing = {n: (file_sources.get(n, source), linkDictionary[n]) for n in ep_list if n in linkDictionary}
+        stage = partial(stage_next_files, listing, finalList[selected], anime_ep, entry_id if api_shows is not None else None)
 
+    speculation.cancel()
+    for future in anilist_futures.values():
+        future.cancel()
     mpv.terminate()
+    if stage is not None and prefetch_episodes > 0 and subtitle_cache.max_bytes > 0 and isinstance(anime_ep, int):
+        # not a daemon thread, so a run started from mpv stays alive until the files are staged
+        threading.Thread(target=stage, name="next-episodes").start()
+
+
+def batch_videos(paths: list[str], *, recursive: bool = False) -> list[Path]:
+    videos = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            found = path.rglob("*") if recursive else path.iterdir()
+            videos += sorted(f for f in found if f.suffix.lower() in video_extensions and f.is_file())
+        elif path.is_file():
+            videos.append(path)
+        else:
+            print(f"Skipping '{path}': not a local file or directory", flush=True)
+    return videos
+
+
+def resolve_show(title: str) -> tuple[HtmlProvider | JimakuApi, str, str] | None:
+    # headless version of the title and show menus: the saved alias or the first AniList result,
+    # then the best match on the first provider that has one
+    alias = store.get_alias(title)
+    if alias is None:
+        media = anilist.search(title)
+        alias = media[0]["romaji"] if media else title
+    # a show picked in mpv is trusted over the best match; shows found here are not remembered
+    profile = store.get_show_profile(alias)
+    if profile_sources(profile):
+        source, href = profile_sources(profile)[0]
+        return source, profile["show"], href
+    for source in search_sources():
+        try:
+            shows = provider_shows(source, alias, 1)
+        except Exception as e:  # noqa: BLE001
+            print(f"Searching {source.name} failed: {e}", flush=True)
+            continue
+        if shows:
+            show_name, href = next(iter(shows.items()))
+            return source, show_name, href
+    return None
+
+
+def batch_download(source: HtmlProvider | JimakuApi, href: str, path: Path) -> Path:
+    url = source.file_url(href)
+    if not path.is_file() and not subtitle_cache.link(url, path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tracer.span("download", "network", host=urlparse(url).netloc):
+            download_file(session, url, path, timeout=timeouts["download"])
+        subtitle_cache.add(url, path)
+    return path
+
+
+def extract_episodes(archive: Path, episodes: dict[Path, Any]) -> dict[Path, Path]:
+    # video -> extracted subtitle; only the members matching the wanted episodes are extracted
+    fmt = archive_format(archive)
+    if fmt is None:
+        raise ValueError(f"Can't extract {archive.name}")
+
+    members = archive_index.members(archive, fmt)
+    parsed = name_parser.parse_many([Path(m).name for m in members])
+    wanted = {}
+    for video, episode in episodes.items():
+        match = next((m for m, p in zip(members, parsed) if p.episode == episode), None)
+        if match is not None:
+            wanted[video] = match
+    if wanted:
+        extract_cached(archive, fmt, sorted(set(wanted.values())), archive.parent)
+    return {video: archive.parent / member for video, member in wanted.items()}
+
+
+def batch_show(pool: ThreadPoolExecutor, title: str, episodes: dict[Path, Any]) -> list[tuple[list[Path], Future]]:
+    # queues the downloads for every video of one show; each future gives the subtitle path of
+    # its videos, or video -> subtitle path for the ones taken from a season pack
+    found = resolve_show(title)
+    if found is None:
+        print(f"{title}: no show found", flush=True)
+        return []
+    source, show_name, href = found
+    print(f"{title}: using '{show_name}' from {source.name}", flush=True)
+    try:
+        files = provider_files(source, href)
+    except Exception as e:  # noqa: BLE001
+        print(f"{title}: listing files failed: {e}", flush=True)
+        return []
+    names = sorted(files)
+    parsed = dict(zip(names, name_parser.parse_many(names)))
+
+    jobs = []
+    downloads: dict[Path, Future] = {}
+    # videos without their own file, by folder, to be taken from a season pack
+    packs: dict[Path, dict[Path, Any]] = {}
+    for video, episode in episodes.items():
+        folder = video.parent / show_name.replace(os.path.sep, " ") if download_in_folder else video.parent
+        match = next((n for n in names if not n.endswith(compressed) and parsed[n].episode == episode), None)
+        if match is None:
+            packs.setdefault(folder, {})[video] = episode
+            continue
+        if folder / match not in downloads:
+            downloads[folder / match] = pool.submit(batch_download, source, files[match], folder / match)
+        jobs.append(([video], downloads[folder / match]))
+
+    archives = [n for n in names if n.endswith(compressed) and can_extract(n)]
+    # a file without an episode number is most likely the whole season
+    archive = next((n for n in archives if parsed[n].episode is None), archives[0] if archives else None)
+    for folder, wanted in packs.items():
+        if archive is None:
+            jobs.append((list(wanted), None))
+            continue
+
+        def from_pack(folder: Path = folder, wanted: dict[Path, Any] = wanted) -> dict[Path, Path]:
+            return extract_episodes(batch_download(source, files[archive], folder / archive), wanted)
+
+        jobs.append((list(wanted), pool.submit(from_pack)))
+    return jobs
+
+
+def batch(paths: list[str]) -> None:
+    # Headless: downloads subtitles for every video in paths (files or directories) without any menus
+    shows: dict[str, dict[Path, Any]] = {}
+    for video in batch_videos(paths):
+        title, episode = get_title(video.name), get_episode(video.name)
+        if title is None or episode is None:
+            print(f"Skipping '{video.name}': no title or episode found in the name", flush=True)
+            continue
+        shows.setdefault(title, {})[video] = episode
+
+    with ThreadPoolExecutor(max_workers=batch_workers, thread_name_prefix="batch") as pool:
+        jobs = []
+        for title, episodes in shows.items():
+            jobs += batch_show(pool, title, episodes)
+        for videos, future in jobs:
+            try:
+                result = future.result() if future is not None else {}
+            except Exception as e:  # noqa: BLE001
+                for video in videos:
+                    print(f"{video.name}: failed: {e}", flush=True)
+                continue
+            subtitles = result if isinstance(result, dict) else dict.fromkeys(videos, result)
+            for video in videos:
+                print(f"{video.name}: {subtitles.get(video, 'no subtitles found')}", flush=True)
+
+
+def prewarm_show(title: str, episodes: list) -> str:
+    # looks up everything main() needs for title (alias, show, file listing and its parsed names),
+    # so searching any of its episodes later only reads the store
+    found = resolve_show(title)
+    if found is None:
+        return "no show found"
+    source, show_name, href = found
+    if isinstance(source, JimakuApi):
+        # main() asks the API for the files of the current episode only
+        names = [name for episode in episodes for name in source.files(href, episode)]
+    else:
+        names = list(provider_files(source, href))
+    name_parser.parse_many(names)
+    store.set_prewarmed(title, source.name, show_name, href, time.time())
+    return f"'{show_name}' from {source.name}, {len(names)} files"
+
+
+def prewarm(paths: list[str]) -> None:
+    # Headless: resolves every show found under paths; shows done in the last prewarm_ttl seconds are
+    # skipped, so an interrupted run continues where it stopped
+    videos = batch_videos(paths, recursive=True)
+    name_parser.parse_many([video.name for video in videos])
+    shows: dict[str, list] = {}
+    for video in videos:
+        title, episode = get_title(video.name), get_episode(video.name)
+        if title is None:
+            continue
+        episodes = shows.setdefault(title, [])
+        if episode is not None and episode not in episodes:
+            episodes.append(episode)
+
+    done = store.prewarmed_since(time.time() - prewarm_ttl)
+    titles = [title for title in shows if title not in done]
+    print(f"{len(shows)} shows in {len(videos)} videos, {len(shows) - len(titles)} already resolved", flush=True)
+    if not titles:
+        return
+
+    # one AniList request per batch of titles instead of one per show
+    missing = [title for title in titles if store.get_alias(title) is None]
+    for title, media in anilist.search_many(missing).items():
+        if media:
+            store.set_alias(title, media[0]["romaji"])
+    for source in search_sources():
+        if isinstance(source, HtmlProvider):
+            try:
+                title_index(source, catalog_cache.load(source.list_url, source.parser()).entries)
+            except Exception as e:  # noqa: BLE001
+                print(f"Fetching the {source.name} catalog failed: {e}", flush=True)
 
-if __name__ == "__main__":
+    with ThreadPoolExecutor(max_workers=prewarm_workers, thread_name_prefix="prewarm") as pool:
+        futures = {pool.submit(prewarm_show, title, shows[title]): title for title in titles}
+        for count, future in enumerate(as_completed(futures), 1):
+            try:
+                result = future.result()
+            except Exception as e:  # noqa: BLE001
+                result = f"failed: {e}"
+            print(f"[{count}/{len(titles)}] {futures[future]}: {result}", flush=True)
+    catalog_cache.wait()
+
+
+def run_session(ipc_socket: str) -> None:
+    global mpv, provider
+    # a provider fallback only applies to the session it happened in
+    provider = default_provider
     try:
-        main()
+        mpv = MPV(start_mpv=False, ipc_socket=ipc_socket, quit_callback=end_session)
+    except OSError as e:
+        print(f"Could not connect to mpv at '{ipc_socket}': {e}", flush=True)
+        return
+    profiler.mark("connect to mpv")
+    tracer.begin_run()
+    try:
+        with tracer.span("run", "total"):
+            main()
+    except SystemExit:
+        pass
+    except ConnectionError as e:
+        print(f"Lost the connection to mpv: {e}", flush=True)
     except Exception:  # noqa: BLE001
+        traceback.print_exc()
         mpv.terminate()
+    finally:
+        tracer.end_run()
+
+
+profiler.mark("imports and setup")
+
+if __name__ == "__main__":
+    if sys.argv[1] == "--server":
+        serve(run_session)
+    elif sys.argv[1] == "--batch":
+        with tracer.span("batch", "total"):
+            batch(sys.argv[2:])
+    elif sys.argv[1] == "--prewarm":
+        with tracer.span("prewarm", "total"):
+            prewarm(sys.argv[2:])
+    else:
+        run_session(sys.argv[1])
@@ -0,0 +1,82 @@
+import json
+import socket
+import socketserver
+import sys
+import threading
+from collections.abc import Callable
+
+# Kept free of heavy imports: subs-dl.py imports this before anything else to hand
+# its mpv socket to a running server as cheaply as possible.
+
+server_address = ("127.0.0.1", 47831)
+# seconds a request waits for the running session to finish; a client turned away runs the session itself
+session_wait = 1.0
+
+
+class SessionHandler(socketserver.StreamRequestHandler):
+
+    def handle(self) -> None:
+        request = json.loads(self.rfile.readline())
+        # sessions share the script's module state (current mpv, provider), so they run one at a time
+        if not self.server.session_lock.acquire(timeout=session_wait):
+            self.wfile.write(b"busy\n")
+            return
+        try:
+            self.wfile.write(b"accepted\n")
+            self.wfile.flush()
+            self.server.run_session(request["socket"])
+        finally:
+            self.server.session_lock.release()
+            self.wfile.write(b"done\n")
+
+
+class SessionServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    # on Windows SO_REUSEADDR lets a second server bind the port while the first one runs, and main.lua
+    # relies on that bind failing; the port is claimed with SO_EXCLUSIVEADDRUSE there instead
+    allow_reuse_address = sys.platform != "win32"
+
+    def server_bind(self) -> None:
+        if hasattr(socket, "SO_EXCLUSIVEADDRUSE"):
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_EXCLUSIVEADDRUSE, 1)
+        super().server_bind()
+
+    def __init__(self, address: tuple[str, int], run_session: Callable[[str], None]) -> None:
+        super().__init__(address, SessionHandler)
+        self.run_session = run_session
+        self.session_lock = threading.Lock()
+
+
+def serve(run_session: Callable[[str], None], address: tuple[str, int] = server_address) -> None:
+    try:
+        server = SessionServer(address, run_session)
+    except OSError as e:
+        print(f"Could not start server on {address[0]}:{address[1]} (already running?): {e}", flush=True)
+        return
+    print(f"Serving on {address[0]}:{address[1]}", flush=True)
+    with server:
+        server.serve_forever()
+
+
+def hand_off(ipc_socket: str, address: tuple[str, int] = server_address) -> bool:
+    # Returns False when no server accepted the socket, so the caller runs the session itself.
+    # Otherwise blocks until the server is done with it: main.lua tears down the IPC server
+    # as soon as this process exits.
+    try:
+        conn = socket.create_connection(address, timeout=0.5)
+    except OSError:
+        return False
+    with conn, conn.makefile("rb") as reply:
+        try:
+            conn.sendall(json.dumps({"socket": ipc_socket}).encode("utf-8") + b"\n")
+            conn.settimeout(session_wait + 0.5)
+            if reply.readline() != b"accepted\n":
+                return False
+        except OSError:
+            return False
+        conn.settimeout(None)
+        try:
+            reply.readline()
+        except OSError:
+            pass
+    return True
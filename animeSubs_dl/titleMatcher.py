@@ -0,0 +1,45 @@
+import heapq
+from collections import defaultdict
+from difflib import SequenceMatcher
+from collections.abc import Iterable
+
+
+def trigrams(text: str) -> set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TitleIndex:
+    # Trigram inverted index over the (lowercase) catalog titles. Candidates sharing the most trigrams
+    # with the query are reranked with the same SequenceMatcher scoring difflib.get_close_matches uses,
+    # so results match it for anything that survives the pruning step.
+    # Rebuilding takes less time than reading a saved copy back, so it only lives in memory.
+
+    def __init__(self, titles: Iterable[str]) -> None:
+        self.titles = list(titles)
+        postings = defaultdict(list)
+        for i, title in enumerate(self.titles):
+            for gram in trigrams(title):
+                postings[gram].append(i)
+        self.postings = dict(postings)
+
+    def candidates(self, word: str, limit: int) -> list[int]:
+        grams = trigrams(word)
+        counts: dict[int, int] = defaultdict(int)
+        for gram in grams:
+            for i in self.postings.get(gram, ()):
+                counts[i] += 1
+        # Dice coefficient, approximating a title's trigram count by its padded length
+        size = len(grams)
+        titles = self.titles
+        return heapq.nlargest(limit, counts, key=lambda i: counts[i] / (size + len(titles[i]) + 1))
+
+    def get_close_matches(self, word: str, n: int = 3, cutoff: float = 0.6, *, candidates: int = 500) -> list[str]:
+        s = SequenceMatcher()
+        s.set_seq2(word)
+        result = []
+        for i in self.candidates(word, candidates):
+            s.set_seq1(self.titles[i])
+            if s.real_quick_ratio() >= cutoff and s.quick_ratio() >= cutoff and s.ratio() >= cutoff:
+                result.append((s.ratio(), self.titles[i]))
+        return [title for _, title in heapq.nlargest(n, result)]
@@ -0,0 +1,66 @@
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "animeSubs_dl"))
+
+from localStore import Store  # noqa: E402
+from nameParser import NameParser, parse_name  # noqa: E402
+
+GROUPS = ["Erai-raws", "SubsPlease", "Judas", "Netflix", "Amazon", "nekomoe kissaten", "jimaku"]
+
+
+def synthetic_listing(size: int, rng: random.Random) -> list[str]:
+    # file names of a long running show the way subtitle groups name them
+    names = []
+    for i in range(size):
+        episode = i % 1100 + 1
+        group = rng.choice(GROUPS)
+        name = rng.choice([
+            f"[{group}] One Piece - {episode:04} [1080p][{rng.randrange(16 ** 8):08X}].ja.srt",
+            f"One.Piece.E{episode:04}.WEBRip.{group}.ja.ass",
+            f"[{group}] One Piece - {episode}v{rng.randint(2, 3)}.srt",
+        ])
+        names.append(name)
+    return names
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main(size: int = 2000, episode: int = 1000) -> None:
+    rng = random.Random(0)
+    names = synthetic_listing(size, rng)
+    parse_name(names[0])  # import aniparse outside of the timings
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = Store(Path(tmp) / "subs.db")
+
+        def filter_with(parse):
+            return [s for s in names if parse(s).episode == episode]
+
+        expected, uncached = timed(lambda: filter_with(parse_name))
+
+        parser = NameParser(store)
+        cold, cold_time = timed(lambda: parser.parse_many(names) and filter_with(parser.parse))
+        warm, warm_time = timed(lambda: parser.parse_many(names) and filter_with(parser.parse))
+
+        # a later run: empty memory, names already in the store
+        parser = NameParser(store)
+        stored, stored_time = timed(lambda: parser.parse_many(names) and filter_with(parser.parse))
+
+    same = "identical" if expected == cold == warm == stored else "DIFFERENT"
+    print(f"{size} files, {len(expected)} for episode {episode}, results {same}")
+    print(f"aniparse every file:   {uncached * 1000:8.1f} ms")
+    print(f"first visit:           {cold_time * 1000:8.1f} ms  (parse and store)")
+    print(f"later run:             {stored_time * 1000:8.1f} ms  (from the store)")
+    print(f"same session:          {warm_time * 1000:8.1f} ms  (from memory)")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
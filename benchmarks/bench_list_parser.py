@@ -0,0 +1,64 @@
+import html
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "animeSubs_dl"))
+
+from listParser import AnchorSelector, get_parser  # noqa: E402
+
+SELECTORS = {
+    "jimaku": AnchorSelector(".table-data.file-name", classes=frozenset({"table-data", "file-name"})),
+    "kitsunekko": AnchorSelector("a:has(>strong)", child="strong"),
+}
+
+
+def synthetic_page(provider: str, size: int, rng: random.Random) -> bytes:
+    # mirrors the markup the provider selectors target, padded with the surrounding table cells
+    rows = []
+    for i in range(size):
+        title = html.escape(f"Title {i} " + "".join(rng.choice("abcdefghij &<>'") for _ in range(rng.randint(5, 40))))
+        if provider == "jimaku":
+            rows.append(
+                f'<tr><td><a class="table-data file-name" href="/entry/{i}">{title}</a></td>'
+                f'<td class="table-data">{rng.randint(1, 500)} files</td><td class="table-data"><span>2024-01-01</span></td></tr>'
+            )
+        else:
+            rows.append(
+                f'<tr><td><a href="subtitles/japanese/{i}/" class=""><strong>{title}</strong></a></td>'
+                f'<td class="tdright" title="x">{rng.randint(1, 500)}&nbsp;MB</td><td><a href="/other/{i}">not a show</a></td></tr>'
+            )
+    return (
+        "<!DOCTYPE html><html><head><meta charset=utf-8><title>x</title></head><body><table>"
+        + "".join(rows) + "</table><br><img src=x></body></html>"
+    ).encode("utf-8")
+
+
+def main(size: int = 5000, rounds: int = 5) -> None:
+    rng = random.Random(0)
+    # bench_list_parser.py [SIZE] [PAGE.html PROVIDER] benchmarks a saved page instead
+    pages = {provider: synthetic_page(provider, size, rng) for provider in SELECTORS}
+    if len(sys.argv) > 3:
+        pages = {sys.argv[3]: Path(sys.argv[2]).read_bytes()}
+
+    for provider, content in pages.items():
+        print(f"{provider}: {len(content) / 1e6:.1f} MB")
+        expected = get_parser("soup")(content, SELECTORS[provider])
+        for backend in ("soup", "stream", "lxml"):
+            try:
+                parse = get_parser(backend)
+                parse(content, SELECTORS[provider])
+            except ImportError:
+                print(f"  {backend:<8} not installed")
+                continue
+            start = time.perf_counter()
+            for _ in range(rounds):
+                result = parse(content, SELECTORS[provider])
+            elapsed = (time.perf_counter() - start) / rounds
+            same = "identical" if result == expected else "DIFFERENT"
+            print(f"  {backend:<8}{elapsed * 1000:9.1f} ms  {len(result[0])} entries, {same}")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,67 @@
+import random
+import sys
+import time
+from difflib import get_close_matches
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "animeSubs_dl"))
+
+from titleMatcher import TitleIndex  # noqa: E402
+
+SYLLABLES = ["ka", "ki", "ku", "ko", "sa", "shi", "su", "to", "na", "no", "ha", "ma", "mi", "ra", "ri", "yo", "n", "tsu", "chi", "ro"]
+WORDS = ["no", "ga", "to", "season", "2nd", "the", "movie", "ova", "kun", "san", "monogatari", "academia", "world", "sekai"]
+
+
+def synthetic_title(rng: random.Random) -> str:
+    words = []
+    for _ in range(rng.randint(2, 6)):
+        if rng.random() < 0.3:
+            words.append(rng.choice(WORDS))
+        else:
+            words.append("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 4))))
+    return " ".join(words)
+
+
+def perturb(title: str, rng: random.Random) -> str:
+    chars = list(title)
+    for _ in range(rng.randint(0, 3)):
+        i = rng.randrange(len(chars))
+        chars[i] = rng.choice("abcdefghijklmnopqrstuvwxyz ")
+    words = "".join(chars).split()
+    if len(words) > 2 and rng.random() < 0.3:
+        words.pop()
+    return " ".join(words)
+
+
+def main(size: int = 20000, queries: int = 100, n: int = 20, cutoff: float = 0.3) -> None:
+    rng = random.Random(0)
+    titles = list(dict.fromkeys(synthetic_title(rng) for _ in range(size)))
+    words = [perturb(rng.choice(titles), rng) for _ in range(queries)]
+
+    start = time.perf_counter()
+    index = TitleIndex(titles)
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    expected = [get_close_matches(w, titles, n, cutoff) for w in words]
+    difflib_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = [index.get_close_matches(w, n, cutoff) for w in words]
+    index_time = time.perf_counter() - start
+
+    top1 = sum(bool(e) and bool(a) and e[0] == a[0] for e, a in zip(expected, actual)) / queries
+    overlap = sum(len(set(e) & set(a)) / max(len(e), 1) for e, a in zip(expected, actual)) / queries
+    overlap5 = sum(len(set(e[:5]) & set(a[:5])) / max(len(e[:5]), 1) for e, a in zip(expected, actual)) / queries
+
+    print(f"catalog: {len(titles)} titles, {queries} queries, top-{n}, cutoff {cutoff}")
+    print(f"index build:   {build_time * 1000:8.1f} ms")
+    print(f"difflib:       {difflib_time / queries * 1000:8.2f} ms/query")
+    print(f"title index:   {index_time / queries * 1000:8.2f} ms/query")
+    print(f"top-1 agreement:   {top1:.1%}")
+    print(f"top-5 overlap:     {overlap5:.1%}")
+    print(f"top-{n} overlap:    {overlap:.1%}")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
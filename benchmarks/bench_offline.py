@@ -0,0 +1,173 @@
+import argparse
+import json
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+from offline import FIXTURES, FakeMpv, FixtureServer, catalog_titles, load_subs_dl
+
+# the video played and the entries picked in the menus, see record_fixtures.py
+SCENARIO = json.loads((FIXTURES / "manifest.json").read_text(encoding="utf-8"))["scenario"]
+VIDEO = SCENARIO["video"]
+RUNS = {
+    "main() subtitle": {"Select Show": SCENARIO["show"], "Select file": SCENARIO["file"]},
+    "main() season pack": {
+        "Select Show": SCENARIO["show"],
+        "Select file": SCENARIO["archive"],
+        "Select file from zip file": SCENARIO["member"],
+    },
+}
+# runs made with a JIMAKU_API_KEY, so the show and its files come from the fixture server's jimaku API
+API_RUNS = {"main() jimaku API": RUNS["main() subtitle"]}
+
+
+def timed(func: Callable[[], object], rounds: int, setup: Callable[[], object] | None = None) -> float:
+    # median seconds over rounds; setup runs before every round, outside of the timing
+    times = []
+    for _ in range(rounds):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def perturb(title: str, rng: random.Random) -> str:
+    chars = list(title.lower())
+    for _ in range(rng.randint(0, 2)):
+        chars[rng.randrange(len(chars))] = rng.choice("abcdefghijklmnopqrstuvwxyz ")
+    return "".join(chars)
+
+
+def bench_catalog(sd, rounds: int) -> dict[str, float]:
+    url = sd.provider.list_url
+
+    def forget() -> None:
+        sd.catalog_cache.memory.clear()
+        with sd.store.connection() as conn:
+            conn.execute("DELETE FROM catalog")
+
+    results = {"get_list: fetch and parse": timed(lambda: sd.fetch_list(url), rounds, forget)}
+    results["get_list: from the store"] = timed(lambda: sd.fetch_list(url), rounds, sd.catalog_cache.memory.clear)
+    results["get_list: from memory"] = timed(lambda: sd.fetch_list(url), rounds)
+
+    entries = sd.fetch_list(url)
+    titles = list(entries.values())
+    results["title index: build"] = timed(lambda: sd.TitleIndex(titles), rounds)
+
+    rng = random.Random(0)
+    queries = [perturb(rng.choice(catalog_titles()), rng) for _ in range(50)]
+    index = sd.title_index(sd.provider, entries)
+    results["fuzzy match (per query)"] = timed(lambda: [index.get_close_matches(q, 20, 0.3) for q in queries], rounds) / len(queries)
+    return results
+
+
+def bench_scroll_list(sd, directory: Path, entries: list[str], rounds: int) -> dict[str, float]:
+    # a menu of every catalog entry, scrolled down 100 entries by the fake mpv
+    import scrollList
+    choice = entries[min(100, len(entries) - 1)]
+    with FakeMpv(directory / "menu.sock", directory / VIDEO, choices={"Benchmark": choice}) as fake:
+        mpv = sd.MPV(start_mpv=False, ipc_socket=str(fake.path))
+        scrollList.latency.reset()
+        total = timed(lambda: scrollList.ScrollList(mpv, "Benchmark", entries).get_selection(), rounds)
+        mpv.terminate()
+    summary = scrollList.latency.summary()
+    return {
+        "ScrollList: open": summary["open"][1],
+        "ScrollList: one key press": summary["overlay"][1],
+        "ScrollList: close": summary["close"][1],
+        "ScrollList: 100 entries down": total,
+    }
+
+
+def bench_archive(sd, directory: Path, server: FixtureServer, rounds: int) -> dict[str, float]:
+    archive = directory / "pack.zip"
+    archive.write_bytes(server.archive)
+    fmt = sd.archive_format(archive)
+    members = sd.archive_index.members(archive, fmt)
+    target = directory / "extracted"
+
+    def forget() -> None:
+        with sd.store.connection() as conn:
+            conn.execute("DELETE FROM archive_members")
+            conn.execute("DELETE FROM blob_keys")
+
+    return {
+        "handlezip: read members": timed(lambda: sd.archive_index.members(archive, fmt), rounds, forget),
+        "handlezip: members, indexed": timed(lambda: sd.archive_index.members(archive, fmt), rounds),
+        "handlezip: extract all": timed(lambda: sd.extract_cached(archive, fmt, members, target), rounds, forget),
+        "handlezip: link all from cache": timed(lambda: sd.extract_cached(archive, fmt, members, target), rounds),
+    }
+
+
+def bench_main(server: FixtureServer, rounds: int) -> dict[str, float]:
+    # full runs of main() against the fake mpv, in a fresh directory (cold) and then again (warm)
+    results = {}
+    runs = [(name, choices, None) for name, choices in RUNS.items()]
+    runs += [(name, choices, "offline") for name, choices in API_RUNS.items()]
+    for name, choices, api_key in runs:
+        cold, warm = [], []
+        for _ in range(rounds):
+            with tempfile.TemporaryDirectory() as tmp:
+                directory = Path(tmp)
+                sd = load_subs_dl(directory, server.url, api_key=api_key)
+                (directory / VIDEO).touch()
+                for times in (cold, warm):
+                    with FakeMpv(directory / "mpv.sock", directory / VIDEO, choices=choices) as fake:
+                        start = time.perf_counter()
+                        sd.run_session(str(fake.path))
+                        times.append(time.perf_counter() - start)
+                    if not fake.subtitles:
+                        raise RuntimeError(f"{name}: no subtitle was loaded, menus: {fake.menus}")
+                    if api_key is not None and not any(r.startswith("/api/entries/") for r in server.requests):
+                        raise RuntimeError(f"{name}: the jimaku API was not used")
+                sd.catalog_cache.wait()
+        results[f"{name}: cold"] = statistics.median(cold)
+        results[f"{name}: warm"] = statistics.median(warm)
+    return results
+
+
+def commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Times the search pipeline against a fake mpv and recorded provider pages")
+    parser.add_argument("--scale", type=int, default=20000, help="synthetic shows added to every catalog")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds added to every response of the fixture server")
+    parser.add_argument("--save", type=Path, help="write the results to this JSON file")
+    parser.add_argument("--compare", type=Path, help="results saved by an earlier run (e.g. another commit)")
+    args = parser.parse_args()
+
+    with FixtureServer(scale=args.scale, delay=args.delay) as server, tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        sd = load_subs_dl(directory, server.url)
+        results = bench_catalog(sd, args.rounds)
+        entries = list(sd.fetch_list(sd.provider.list_url).values())
+        results |= bench_scroll_list(sd, directory, entries, args.rounds)
+        results |= bench_archive(sd, directory, server, args.rounds)
+        sd.catalog_cache.wait()
+        results |= bench_main(server, args.rounds)
+
+    previous = json.loads(args.compare.read_text())["results"] if args.compare else {}
+    print(f"{len(entries)} shows per catalog, {server.member_count} archive members, median of {args.rounds} rounds")
+    for name, seconds in results.items():
+        line = f"  {name:<36}{seconds * 1000:10.2f} ms"
+        if name in previous:
+            line += f"  {previous[name] * 1000:10.2f} ms before ({seconds / previous[name]:.2f}x)"
+        print(line)
+    if args.save:
+        args.save.write_text(json.dumps({"commit": commit(), "scale": args.scale, "rounds": args.rounds, "results": results}, indent=1))
+
+
+if __name__ == "__main__":
+    main()
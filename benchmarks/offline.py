@@ -0,0 +1,324 @@
+import dataclasses
+import html
+import importlib.util
+import io
+import json
+import os
+import random
+import re
+import shutil
+import socket
+import sys
+import threading
+import time
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from types import ModuleType
+from urllib.parse import parse_qs, quote_plus, unquote, urlsplit
+
+# Everything the offline benchmarks need instead of mpv and the subtitle sites: a local server
+# replaying the recorded provider pages in fixtures/ and a JSON IPC socket that behaves like mpv
+# with a user picking menu entries. Unix sockets only, like python_mpv_jsonipc outside of Windows.
+
+SOURCE = Path(__file__).resolve().parent.parent / "animeSubs_dl"
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+ENTRY = re.compile(r'class="table-data file-name" href="/entry/(\d+)">([^<]+)</a>')
+SYLLABLES = ["ka", "ki", "ku", "ko", "sa", "shi", "su", "to", "na", "no", "ha", "ma", "mi", "ra", "ri", "yo", "n", "tsu"]
+
+
+def synthetic_row(provider: str, i: int, rng: random.Random) -> str:
+    # a catalog row in the provider's markup, for shows that are never chosen
+    title = " ".join("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 4))) for _ in range(rng.randint(2, 6)))
+    if provider == "jimaku":
+        return f'<tr><td><a class="table-data file-name" href="/entry/{100000 + i}">{title}</a></td><td class="table-data">{i % 90} files</td></tr>\n'
+    return f'<tr><td><a href="dirlist.php?dir=subtitles%2Fjapanese%2F{quote_plus(title)}%2F" class=""><strong>{title}</strong> </a></td></tr>\n'
+
+
+class FixtureServer:
+    # Replays fixtures/ (written by record_fixtures.py) on a local port. Every catalog gets scale extra
+    # synthetic shows, subtitle downloads get generated content, and archives are zipped from the
+    # recorded member names. The jimaku API under /api/ answers from the recorded jimaku pages.
+    # delay is added to every response to stand in for the network.
+
+    def __init__(self, *, scale: int = 0, delay: float = 0.0, fixtures: Path = FIXTURES) -> None:
+        manifest = json.loads((fixtures / "manifest.json").read_text(encoding="utf-8"))
+        self.delay = delay
+        self.pages = {path: (fixtures / name).read_bytes() for path, name in manifest["pages"].items()}
+        rng = random.Random(0)
+        for path, provider in manifest["catalogs"].items():
+            rows = "".join(synthetic_row(provider, i, rng) for i in range(scale)).encode()
+            self.pages[path] = self.pages[path].replace(b"</table>", rows + b"</table>", 1)
+        self.anilist = json.loads((fixtures / manifest["anilist"]).read_text(encoding="utf-8"))["data"]["Page"]
+        # jimaku API entries: the recorded catalog's shows, with the files of the recorded show pages
+        self.entries = {int(i): html.unescape(name) for i, name in ENTRY.findall(self.pages["/"].decode("utf-8"))}
+        self.entry_files = {
+            int(m[1]): re.findall(rf'href="(/entry/{m[1]}/download/[^"]+)"', content.decode("utf-8"))
+            for path, content in self.pages.items() if (m := re.fullmatch(r"/entry/(\d+)", path))
+        }
+        members = (fixtures / manifest["archive_members"]).read_text(encoding="utf-8").splitlines()
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zfile:
+            for member in members:
+                zfile.writestr(member, subtitle_content(member))
+        self.archive = buffer.getvalue()
+        self.member_count = len(members)
+        self.requests: list[str] = []
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.handler())
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def handler(self) -> type[BaseHTTPRequestHandler]:
+        fixtures = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                fixtures.requests.append(self.path)
+                time.sleep(fixtures.delay)
+                name = unquote(urlsplit(self.path).path).rsplit("/", 1)[-1]
+                if self.path.startswith("/api/"):
+                    if not self.headers.get("Authorization"):
+                        self.send_error(401)
+                        return
+                    body = fixtures.api(self.path)
+                    if body is None:
+                        self.send_error(404)
+                    else:
+                        self.reply(json.dumps(body).encode(), "application/json")
+                elif self.path in fixtures.pages:
+                    self.reply(fixtures.pages[self.path], "text/html; charset=utf-8")
+                elif name.endswith((".zip", ".7z", ".rar")):
+                    self.reply(fixtures.archive, "application/zip")
+                elif name.endswith((".ass", ".srt", ".ssa", ".vtt")):
+                    self.reply(subtitle_content(name), "application/octet-stream")
+                else:
+                    self.send_error(404)
+
+            def do_POST(self) -> None:
+                # AniList: the recorded result for every search in the batch
+                fixtures.requests.append(self.path)
+                time.sleep(fixtures.delay)
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                data = {name: fixtures.anilist for name in body["variables"]}
+                self.reply(json.dumps({"data": data}).encode(), "application/json")
+
+            def reply(self, body: bytes, content_type: str) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args) -> None:
+                pass
+
+        return Handler
+
+    def api(self, path: str) -> list[dict] | None:
+        # /api/entries/search?anilist_id=...&query=... and /api/entries/{id}/files?episode=...
+        parts = urlsplit(path)
+        params = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        if parts.path == "/api/entries/search":
+            if "anilist_id" in params:
+                media = next((m for m in self.anilist["media"] if str(m["id"]) == params["anilist_id"]), None)
+                names = {t.lower() for t in media["title"].values() if t} if media else set()
+                found = [i for i, name in self.entries.items() if name.lower() in names]
+            else:
+                query = params.get("query", "").lower()
+                found = [i for i, name in self.entries.items() if query in name.lower()]
+            return [{"id": i, "name": self.entries[i]} for i in found]
+        files = re.fullmatch(r"/api/entries/(\d+)/files", parts.path)
+        if files is None:
+            return None
+        hrefs = self.entry_files.get(int(files[1]), [])
+        if "episode" in params:
+            # close enough to the API's own episode filter for the recorded names (S01E05, " - 05")
+            episode = re.compile(rf"(?:E|\s)0*{int(params['episode'])}(?!\d)")
+            hrefs = [h for h in hrefs if episode.search(unquote(h.rsplit("/", 1)[-1]))]
+        return [{"name": unquote(h.rsplit("/", 1)[-1]), "url": self.url + h} for h in hrefs]
+
+    def __enter__(self) -> "FixtureServer":
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def subtitle_content(name: str) -> bytes:
+    lines = [f"{i}\n00:00:{i:02},000 --> 00:00:{i:02},900\n{name} {i}\n" for i in range(1, 60)]
+    return "\n".join(lines).encode()
+
+
+def overlay_lines(data: str) -> list[str]:
+    # the text of an ASS overlay, one entry per line
+    text = re.sub(r"\{[^}]*\}", "", data).replace("\\h", " ")
+    return [line.strip() for line in text.split("\\N") if line.strip()]
+
+
+def at_end(lines: list[str]) -> bool:
+    # long menus end with the cursor position, e.g. (16/40); short ones show every entry
+    position = re.fullmatch(r"\((\d+)/(\d+)\)", lines[-1])
+    return position is None or position[1] == position[2]
+
+
+class FakeMpv:
+    # A JSON IPC socket that answers like mpv playing video. It reads the menus from the OSD overlays
+    # and picks entries like a user: choices maps the start of a menu header to the text of the entry
+    # to select (DOWN until the cursor is on it, then ENTER), other menus get their first entry.
+    # Key presses arrive the way mpv sends them for the bindings made with bind_key_press.
+
+    def __init__(self, path: os.PathLike, video: Path, *, choices: dict[str, str] | None = None, think: float = 0.0) -> None:
+        self.path = Path(path)
+        self.choices = choices or {}
+        self.think = think
+        self.properties = {
+            "path": str(video),
+            "working-directory": str(video.parent),
+            "filename": video.name,
+            "media-title": video.stem,
+            "client-name": "subs_dl",
+            "input-ipc-server": str(self.path),
+        }
+        self.commands: list[list] = []
+        self.subtitles: list[str] = []
+        self.menus: list[str] = []
+        self.texts: list[str] = []
+        self.bindings: dict[str, str] = {}
+        self.menu: str | None = None
+        self.lock = threading.Lock()
+        self.server = socket.socket(socket.AF_UNIX)
+
+    def __enter__(self) -> "FakeMpv":
+        self.path.unlink(missing_ok=True)
+        self.server.bind(str(self.path))
+        self.server.listen()
+        threading.Thread(target=self.accept, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.server.close()
+        self.path.unlink(missing_ok=True)
+
+    def accept(self) -> None:
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return
+            threading.Thread(target=self.serve, args=(conn,), daemon=True).start()
+
+    def serve(self, conn: socket.socket) -> None:
+        send_lock = threading.Lock()
+
+        def send(message: dict) -> None:
+            with send_lock:
+                conn.sendall(json.dumps(message).encode() + b"\n")
+
+        with conn, conn.makefile("rb") as lines:
+            for line in lines:
+                request = json.loads(line)
+                command = request["command"]
+                if isinstance(command, dict):
+                    command = [command.get("name"), *(v for k, v in command.items() if k != "name")]
+                reply = {"error": "success", "data": self.handle(command, send)}
+                if "request_id" in request:
+                    reply["request_id"] = request["request_id"]
+                send(reply)
+
+    def handle(self, command: list, send) -> object:
+        with self.lock:
+            self.commands.append(command)
+        name, args = command[0], command[1:]
+        if name == "get_property":
+            if args[0] == "property-list":
+                return list(self.properties)
+            if args[0] == "command-list":
+                return [{"name": n} for n in ("keybind", "define-section", "enable-section", "osd-overlay", "show-text", "sub-add")]
+            return self.properties.get(args[0])
+        if name == "set_property":
+            self.properties[args[0]] = args[1]
+        elif name in ("keybind", "define-section"):
+            # "KEY script-message custom-bind NAME", as one argument each or as the lines of a section
+            text = " ".join(str(a) for a in args[:2]) if name == "keybind" else str(args[1])
+            for key, bind in re.findall(r"(\S+)\s+script-message\S*\s+custom-bind\s+(\S+)", text):
+                self.bindings[key] = bind
+        elif name == "show-text":
+            self.texts.append(str(args[0]))
+        elif name == "sub-add":
+            self.subtitles.append(str(args[0]))
+        elif name == "osd-overlay":
+            data = next((a for a in args if isinstance(a, str) and a not in ("ass-events", "none")), "")
+            self.on_overlay(data, send)
+        return None
+
+    def on_overlay(self, data: str, send) -> None:
+        lines = overlay_lines(data)
+        if not lines:
+            # the menu was closed; the keys of the next one are only pressed once it has bound them
+            self.menu = None
+            self.bindings.clear()
+            return
+        if lines[0] != self.menu:
+            self.menu = lines[0]
+            self.menus.append(lines[0])
+        # the longest matching prefix, so "Select file from zip file" is not taken for "Select file"
+        prefix = max((p for p in self.choices if lines[0].startswith(p)), key=len, default=None)
+        target = self.choices.get(prefix)
+        cursor = next((line for line in lines if line.startswith("➤")), None)
+        if cursor is None:
+            return
+        if target is None or target in cursor:
+            key = "ENTER"
+        elif any(target in line for line in lines) or not at_end(lines):
+            key = "DOWN"
+        else:
+            key = "ESC"  # not in this menu, so the run ends instead of waiting forever
+        threading.Thread(target=self.press, args=(key, send), daemon=True).start()
+
+    def press(self, key: str, send) -> None:
+        time.sleep(self.think)
+        # menus bind their keys before drawing, but a filter's keys may still be on their way
+        deadline = time.monotonic() + 2
+        while key not in self.bindings and time.monotonic() < deadline:
+            time.sleep(0.001)
+        send({"event": "client-message", "args": ["custom-bind", self.bindings[key]]})
+
+
+def load_subs_dl(directory: Path, url: str, *, api_key: str | None = None) -> ModuleType:
+    # imports a copy of the scripts from directory, so the store and caches start out
+    # empty there instead of in the real ones next to subs-dl.py; every provider points at url,
+    # and the jimaku API is used (at url/api) only when api_key is given
+    os.environ.pop("JIMAKU_API_KEY", None)
+    for module in SOURCE.glob("*.py"):
+        shutil.copy(module, directory / module.name)
+    sys.path.insert(0, str(directory))
+    spec = importlib.util.spec_from_file_location("subs_dl", directory / "subs-dl.py")
+    subs_dl = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(subs_dl)
+
+    providers = subs_dl.html_providers
+    providers["jimaku"] = dataclasses.replace(providers["jimaku"], base_url=url, list_url=f"{url}/")
+    providers["kitsunekko"] = dataclasses.replace(
+        providers["kitsunekko"],
+        base_url=f"{url}/kitsunekko/",
+        list_url=f"{url}/kitsunekko/dirlist.php?dir=subtitles%2Fjapanese%2F"
+    )
+    subs_dl.default_provider = subs_dl.provider = providers["jimaku"]
+    subs_dl.anilist.url = f"{url}/graphql"
+    if api_key is not None:
+        subs_dl.jimaku_api = subs_dl.JimakuApi(
+            subs_dl.store,
+            api_key,
+            get=subs_dl.session.get,
+            timeout=subs_dl.timeouts["list"],
+            ttl=subs_dl.show_list_ttl,
+            api_url=f"{url}/api"
+        )
+    return subs_dl
+
+
+def catalog_titles(fixtures: Path = FIXTURES) -> list[str]:
+    # the show names of the recorded jimaku catalog
+    content = (fixtures / "jimaku_catalog.html").read_text(encoding="utf-8")
+    return [html.unescape(t) for t in re.findall(r'class="table-data file-name"[^>]*>([^<]+)</a>', content)]
@@ -0,0 +1,83 @@
+import io
+import json
+import sys
+import zipfile
+from pathlib import Path
+from urllib.parse import urlsplit
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "animeSubs_dl"))
+
+from httpSession import create_session  # noqa: E402
+from nameParser import parse_name  # noqa: E402
+from providers import html_providers  # noqa: E402
+
+from offline import FIXTURES  # noqa: E402
+
+# record_fixtures.py [TITLE] [EPISODE]: saves the live catalogs, the show pages of TITLE, its AniList
+# search result and the member names of its first zip archive as the fixtures replayed by
+# bench_offline.py, which then plays EPISODE of TITLE. Paths are stored the way the fixture server
+# serves them: jimaku at /, kitsunekko under /kitsunekko/.
+
+ANILIST_QUERY = "query ($s: String) { Page(perPage: 5) { media(search: $s, type: ANIME) { id title { romaji english native } } } }"
+
+
+def local_path(provider: str, url: str) -> str:
+    parts = urlsplit(url)
+    path = f"{parts.path or '/'}{'?' + parts.query if parts.query else ''}"
+    return path if provider == "jimaku" else f"/kitsunekko{path}"
+
+
+def episode_file(names: list[str], episode: int) -> str | None:
+    return next((n for n in sorted(names) if not n.endswith((".zip", ".7z", ".rar")) and parse_name(Path(n).name).episode == episode), None)
+
+
+def main(title: str = "Sousou no Frieren", episode: int = 5) -> None:
+    session = create_session()
+    manifest = json.loads((FIXTURES / "manifest.json").read_text(encoding="utf-8"))
+    manifest |= {"pages": {}, "catalogs": {}, "anilist": "anilist.json", "archive_members": "archive_members.txt"}
+    scenario = manifest["scenario"] = {"video": f"[Group] {title} - {episode:02} [1080p].mkv", "show": title}
+    archive_url = None
+
+    for name, provider in html_providers.items():
+        catalog = session.get(provider.list_url, timeout=30)
+        catalog.raise_for_status()
+        (FIXTURES / f"{name}_catalog.html").write_bytes(catalog.content)
+        manifest["pages"][local_path(name, provider.list_url)] = f"{name}_catalog.html"
+        manifest["catalogs"][local_path(name, provider.list_url)] = name
+
+        _, links = provider.parser()(catalog.content)
+        if title not in links:
+            print(f"{name}: '{title}' is not in the catalog", flush=True)
+            continue
+        show_url = provider.show_url(links[title])
+        show = session.get(show_url, timeout=30)
+        show.raise_for_status()
+        (FIXTURES / f"{name}_show.html").write_bytes(show.content)
+        manifest["pages"][local_path(name, show_url)] = f"{name}_show.html"
+
+        _, files = provider.parser()(show.content)
+        if name == "jimaku":
+            scenario["file"] = episode_file(list(files), episode)
+            scenario["archive"] = next((f for f in sorted(files) if f.endswith(".zip")), None)
+            if scenario["archive"] is not None:
+                archive_url = provider.file_url(files[scenario["archive"]])
+
+    response = session.post("https://graphql.anilist.co", json={"query": ANILIST_QUERY, "variables": {"s": title}}, timeout=30)
+    response.raise_for_status()
+    (FIXTURES / "anilist.json").write_text(json.dumps(response.json(), ensure_ascii=False, indent=1), encoding="utf-8")
+
+    if archive_url is not None:
+        # only the names are kept, the server zips generated subtitles under them
+        with zipfile.ZipFile(io.BytesIO(session.get(archive_url, timeout=60).content)) as zfile:
+            members = [info.filename for info in zfile.infolist() if not info.is_dir()]
+        (FIXTURES / "archive_members.txt").write_text("\n".join(members) + "\n", encoding="utf-8")
+        scenario["member"] = episode_file(members, episode)
+    if None in (scenario.get("file"), scenario.get("archive"), scenario.get("member")):
+        print(f"jimaku has no file, zip archive or archive member for episode {episode} of '{title}': {scenario}", flush=True)
+
+    (FIXTURES / "manifest.json").write_text(json.dumps(manifest, indent=1, ensure_ascii=False) + "\n", encoding="utf-8")
+    print(f"Recorded {len(manifest['pages'])} pages for '{title}'", flush=True)
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:2], *(int(arg) for arg in sys.argv[2:3]))